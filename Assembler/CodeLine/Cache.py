@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from functools import lru_cache
+
+from . import __version__
+
+KEY_NAME = re.compile('[0-9a-f]{64}')
+"""The names of cache entries, so nothing else in the directory is touched"""
+
+
+@lru_cache(maxsize=None)
+def sources_digest():
+    """
+    Hashes the assembler's own source files, so a cache filled by one
+    build of the assembler is never served by another, even if the
+    version wasn't bumped.
+
+    :return: The SHA-256 digest of every module in the package
+    """
+    digest = hashlib.sha256()
+    package = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(package)):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(package, name), 'rb') as in_file:
+            contents = in_file.read()
+        for part in (name.encode(), contents):
+            digest.update(len(part).to_bytes(8, 'little'))
+            digest.update(part)
+    return digest.digest()
+
+
+class Entry:
+    """
+    The finished output of one assembly, as stored in the Cache.
+    """
+    __slots__ = ('obj', 'listing', 'symbols', 'num_bytes')
+
+    def __init__(self, obj: bytes, listing: str, symbols: dict, num_bytes: int):
+        """
+        :param obj: The contents of the object file
+        :param listing: The console listing
+        :param symbols: The symbol table
+        :param num_bytes: The number of bytes assembled
+        """
+        self.obj = obj
+        self.listing = listing
+        self.symbols = symbols
+        self.num_bytes = num_bytes
+
+
+class Cache:
+    """
+    An on-disk cache of finished assemblies. Each entry is a directory
+    named by a hash of everything that went into the assembly, so an
+    unchanged module is served straight from disk and a changed one
+    simply misses. The least recently used entries are evicted once
+    the cache grows past its size limit. Only directories named like
+    a key are ever evicted or cleared, so the cache can share its
+    directory with other files.
+    """
+    OBJECT = 'object'
+    LISTING = 'listing.txt'
+    META = 'meta.json'
+    DEFAULT_SIZE = 64 << 20
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_SIZE):
+        """
+        :param directory: The cache directory, created if needed
+        :param max_bytes: The total size the cache is trimmed to
+        """
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(source: bytes, includes=(), fmt: str = 'text', options=()):
+        """
+        Hashes everything that determines the output of an assembly,
+        including the assembler's own version and source files.
+
+        :param source: The contents of the source file
+        :param includes: (name, contents) pairs for every included file
+        :param fmt: The object file format
+        :param options: The names of any other options that change the output
+        :return: The cache key as a hex string
+        """
+        digest = hashlib.sha256()
+        parts = (__version__.encode(), sources_digest(), fmt.encode(), ','.join(sorted(options)).encode(), source)
+        for part in parts:
+            digest.update(len(part).to_bytes(8, 'little'))
+            digest.update(part)
+        for name, contents in includes:
+            for part in (name.encode(), contents):
+                digest.update(len(part).to_bytes(8, 'little'))
+                digest.update(part)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Looks up an entry and marks it as recently used.
+
+        :param key: A key returned by Cache.key
+        :return: The Entry, or None on a miss
+        """
+        path = os.path.join(self.__directory, key)
+        try:
+            with open(os.path.join(path, Cache.META)) as meta_file:
+                meta = json.load(meta_file)
+            with open(os.path.join(path, Cache.OBJECT), 'rb') as obj_file:
+                obj = obj_file.read()
+            with open(os.path.join(path, Cache.LISTING)) as listing_file:
+                listing = listing_file.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return Entry(obj, listing, meta['symbols'], meta['bytes'])
+
+    def put(self, key: str, entry: Entry):
+        """
+        Stores an entry, then evicts the least recently used entries
+        until the cache fits its size limit. The entry is written to a
+        temporary directory first, so readers never see half of it.
+
+        :param key: A key returned by Cache.key
+        :param entry: The Entry to store
+        """
+        path = os.path.join(self.__directory, key)
+        temp_path = tempfile.mkdtemp(dir=self.__directory, prefix='.tmp')
+        try:
+            with open(os.path.join(temp_path, Cache.OBJECT), 'wb') as obj_file:
+                obj_file.write(entry.obj)
+            with open(os.path.join(temp_path, Cache.LISTING), 'w') as listing_file:
+                listing_file.write(entry.listing)
+            with open(os.path.join(temp_path, Cache.META), 'w') as meta_file:
+                json.dump({'bytes': entry.num_bytes, 'symbols': entry.symbols}, meta_file)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(temp_path, path)
+        except OSError:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the total size
+        is within the limit.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.__directory):
+            path = os.path.join(self.__directory, name)
+            if not KEY_NAME.fullmatch(name) or not os.path.isdir(path):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+            total += size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.__max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """
+        Invalidates every entry.
+        """
+        for name in os.listdir(self.__directory):
+            if KEY_NAME.fullmatch(name):
+                shutil.rmtree(os.path.join(self.__directory, name), ignore_errors=True)
@@ -1,40 +1,103 @@
 from .Memory import Memory
+from .Diagnostic import Diagnostic
+from .Source import comment_operand
+from .Exceptions import *
 
 
 class Checksum(Memory):
-    def __init__(self, line, addr, prev: list, num):
+    def __init__(self, line, addr, num):
         """
-        Stores the raw string, line number, address, optional label, and list
-        of previous Lines. Throws a BadOperand exception if the line length is
-        greater than 64.
+        Stores the raw string, line number, address, optional label, and
+        optional checksum scope. The scope is given by the operand:
 
-        :param line: The raw string
+        * (none) - every byte emitted before the CHK
+        * START - every byte from the label START up to the CHK
+        * START,END - every byte from the label START up to the label END
+
+        An operand that can't be a label is a comment, see comment_operand.
+
+        :param line: A Statement
         :param addr: The memory address
-        :param prev: The list of previous Lines
         :param num: The line number
         """
         super().__init__(line, addr, num)
-        self.__prev: list = prev
+        params = '' if comment_operand(line) else line.operand
+        self.__scope = tuple(params.split(',', 1)) if params else ()
+        self.__chk = 0
+        self.__error = ''
+
+    def scope(self):
+        """
+        :return: The labels bounding the checksum, if any
+        """
+        return self.__scope
+
+    def compute(self, running, marks: dict):
+        """
+        Calculates and stores the checksum from the running XOR of the
+        emitted bytes. Since XOR is its own inverse, the checksum of the
+        bytes between two points is the XOR of the running values at
+        them. Throws a BadOperand exception if a label in the scope
+        hasn't been seen yet, leaving the checksum at 0 rather than at
+        any earlier value.
+
+        :param running: The XOR of every byte emitted before the Checksum
+        :param marks: The running XOR at each label seen so far
+        :return: The XOR checksum of the Line's scope
+        """
+        self.__chk = 0
+        try:
+            bounds = [marks[label] for label in self.__scope]
+        except KeyError as e:
+            raise BadOperand(f"Bad operand in line: {self.num()}") from e
+
+        if len(bounds) == 2:
+            self.__chk = bounds[0] ^ bounds[1]
+        elif len(bounds) == 1:
+            self.__chk = bounds[0] ^ running
+        else:
+            self.__chk = running
+        return self.__chk
+
+    def fail(self, code):
+        """
+        Marks the Line with the given error, for when the Parser keeps
+        going past an error that would otherwise be fatal.
+
+        :param code: The error abbreviation
+        """
+        self.__error = code
+
+    def error(self):
+        return self.__error
 
     def chk(self):
         """
-        :return: The XOR checksum of the previous lines
+        :return: The XOR checksum of the Line's scope
+        """
+        return self.__chk
+
+    def code(self):
+        """
+        :return: The checksum byte, empty if there is an error
         """
-        chk = 0
-        for p in self.__prev:
-            chk ^= p.chk()
-        return chk
+        if self.__error:
+            return b''
+        return bytes((self.__chk & 0xFF,))
 
     def __len__(self):
         return 1
 
     def __str__(self):
+        if self.__error:
+            return "{0}\n{1:<15}{2:>2} {3}".format(
+                Diagnostic.message_for(self.__error, self.num()), '', self.num(), self.raw()
+            )
         opc = self.assembly()
         return "{:<15}{:>2} {}".format(opc, self.num(), self.raw())
 
     def assembly(self):
-        hex_chk = hex(self.chk()).upper()
-        return "{0}: {1:2}".format(
+        return "{0}: {1:02X}".format(
             hex(self.addr()).removeprefix("0x").upper(),
-            hex_chk[len(hex_chk) - 2:]
+            self.chk() & 0xFF
         )
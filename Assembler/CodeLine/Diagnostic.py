@@ -0,0 +1,88 @@
+import json
+
+
+class Diagnostic:
+    """
+    A single problem found while assembling. Collected by Parser and
+    Stream instead of stopping at the first error, so one run can
+    report every problem in a source file.
+    """
+    __slots__ = ('line', 'column', 'code', 'message')
+
+    NAMES = {
+        'bbr': 'Bad branch',
+        'bam': 'Bad address mode',
+        'bop': 'Bad operand',
+        'boc': 'Bad opcode',
+        'dup': 'Duplicate symbol',
+        'mem': 'Memory full',
+        'ovl': 'Overlapping memory',
+        'inc': 'Bad include',
+    }
+    """The error abbreviations and their names"""
+
+    COLUMNS = {
+        'bbr': 15,
+        'bam': 10,
+        'bop': 15,
+        'boc': 10,
+        'dup': 1,
+        'mem': 1,
+        'ovl': 1,
+        'inc': 15,
+    }
+    """The column each kind of error points to by default"""
+
+    def __init__(self, line: int, code: str, message: str = '', column: int = 0):
+        """
+        :param line: The line number
+        :param code: The error abbreviation, one of the keys of NAMES
+        :param message: The message, defaults to "<name> in line: <line>"
+        :param column: The column, defaults to the start of the field at fault
+        """
+        self.line = line
+        self.code = code
+        self.message = message or Diagnostic.message_for(code, line)
+        self.column = column or Diagnostic.COLUMNS.get(code, 1)
+
+    @staticmethod
+    def message_for(code: str, line: int):
+        """
+        :param code: The error abbreviation
+        :param line: The line number
+        :return: The console message for the error
+        """
+        return f"{Diagnostic.NAMES.get(code, 'Error')} in line: {line}"
+
+    @staticmethod
+    def from_exception(e: Exception, line: int):
+        """
+        Converts an exception raised while assembling a line.
+
+        :param e: A CustomException, or a ValueError raised for a bad operand
+        :param line: The line number
+        :return: The matching Diagnostic
+        """
+        code = getattr(e, 'code', '') or 'bop'
+        return Diagnostic(line, code, str(e) if e.args and isinstance(e.args[0], str) else '')
+
+    def to_dict(self):
+        """
+        :return: The Diagnostic as a JSON ready dict
+        """
+        return {'line': self.line, 'column': self.column, 'code': self.code, 'message': self.message}
+
+    def __str__(self):
+        return f"{self.line}:{self.column}: {self.code}: {self.message}"
+
+    def __repr__(self):
+        return "Diagnostic({!r}, {!r}, {!r}, {!r})".format(self.line, self.code, self.message, self.column)
+
+
+def to_json(diagnostics: list, **extra):
+    """
+    :param diagnostics: A list of Diagnostics
+    :param extra: Any other fields to include, such as the filename
+    :return: The Diagnostics as a JSON string
+    """
+    return json.dumps({**extra, 'diagnostics': [d.to_dict() for d in diagnostics]}, indent=2)
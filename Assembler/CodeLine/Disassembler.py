@@ -0,0 +1,149 @@
+from .Opcode import Opcode, DECODE
+from .Image import Image
+from .Parser import Parser
+
+LENGTHS = {
+    'imp': 1, 'acc': 1, 'imm': 2, 'zrp': 2, 'zpx': 2, 'zpy': 2, 'abs': 3,
+    'abx': 3, 'aby': 3, 'ind': 3, 'inx': 2, 'iny': 2, 'rel': 2
+}
+"""The length in bytes of an instruction in each addressing mode"""
+OPERANDS = {
+    'imp': '', 'acc': '', 'imm': '#${:02X}', 'zrp': '${:02X}', 'zpx': '${:02X},X',
+    'zpy': '${:02X},Y', 'abs': '${:04X}', 'abx': '${:04X},X', 'aby': '${:04X},Y',
+    'ind': '(${:04X})', 'inx': '(${:02X},X)', 'iny': '(${:02X}),Y', 'rel': '${:04X}'
+}
+"""The source syntax of the operand in each addressing mode"""
+
+TABLE = [None] * 256
+"""The instruction, addressing mode, and length of each opcode byte, or None if it isn't used"""
+for _opcode, _decoded in enumerate(DECODE):
+    if _decoded is not None:
+        TABLE[_opcode] = (*_decoded, LENGTHS[_decoded[1]])
+
+
+class Instruction:
+    """
+    A single decoded instruction, or a single data byte that isn't
+    the start of one.
+    """
+    __slots__ = ('addr', 'code', 'instr', 'mode')
+
+    def __init__(self, addr: int, code: bytes, instr=None, mode=None):
+        """
+        :param addr: The address of the first byte
+        :param code: The opcode and operand bytes
+        :param instr: The instruction, or None for a data byte
+        :param mode: The addressing mode, or None for a data byte
+        """
+        self.addr = addr
+        self.code = code
+        self.instr = instr
+        self.mode = mode
+
+    def value(self):
+        """
+        :return: The operand as a number. Branches give their target address.
+        """
+        val = int.from_bytes(self.code[1:], 'little')
+        if self.mode == 'rel':
+            val = (self.addr + 2 + val - (val >> 7 << 8)) & 0xFFFF
+        return val
+
+    def operand(self):
+        """
+        :return: The operand in source syntax
+        """
+        if self.instr is None:
+            return ''
+        return OPERANDS[self.mode].format(self.value())
+
+    def __str__(self):
+        """
+        :return: The address, bytes, and instruction in a listing ready format
+        """
+        code = ' '.join(f"{b:02X}" for b in self.code)
+        instr = '???' if self.instr is None else f"{self.instr:<5}{self.operand()}"
+        return f"{self.addr:04X}: {code:<9}  {instr}".rstrip() + '\n'
+
+
+def disassemble(data, origin: int = 0):
+    """
+    Decodes the bytes in order, straight from the buffer. A byte that
+    isn't a known opcode, or that starts an instruction cut off by
+    the end of the data, is given as a data byte.
+
+    :param data: A bytes, bytearray, or memoryview of machine code
+    :param origin: The address of the first byte
+    :return: A generator of Instructions
+    """
+    data = bytes(data)
+    table = TABLE
+    end = len(data)
+    i = 0
+    while i < end:
+        decoded = table[data[i]]
+        if decoded is None or i + decoded[2] > end:
+            yield Instruction(origin + i, data[i:i + 1])
+            i += 1
+            continue
+        instr, mode, length = decoded
+        yield Instruction(origin + i, data[i:i + length], instr, mode)
+        i += length
+
+
+def disassemble_image(image: Image):
+    """
+    Decodes each occupied range of the memory Image, leaving out the
+    gaps between them.
+
+    :param image: The memory Image
+    :return: A generator of Instructions
+    """
+    for start, end in image.ranges():
+        yield from disassemble(image.view(start, end), start)
+
+
+def read_object(text: str):
+    """
+    Loads the text object format written by Parser.write_to_file.
+
+    :param text: The contents of the object file, lines of "ADDR: B1 B2 B3"
+    :return: A memory Image holding the bytes
+    """
+    image = Image()
+    for num, line in enumerate(text.splitlines(), 1):
+        addr, _, code = line.partition(':')
+        if not addr.strip():
+            continue
+        image.write(int(addr, 16), bytes.fromhex(code), num)
+    return image
+
+
+def round_trip(str_lines: list, base=None):
+    """
+    Assembles the source, then decodes the memory Image at the address
+    of every instruction and checks that it gives back the same
+    instruction, addressing mode, and bytes it was encoded as. Decoding
+    at the known addresses keeps the checksum bytes from being read as
+    instructions.
+
+    :param str_lines: A list of lines taken from the source code
+    :param base: A read-only symbol table under the program's own, or None
+    :return: A list of problems, empty if the round trip matches
+    """
+    parser = Parser(str_lines, False, base=base)
+    problems = [d.message for d in parser.diagnostics()]
+    if problems:
+        return problems
+
+    image = parser.image()
+    for line in parser.lines():
+        if not isinstance(line, Opcode):
+            continue
+        addr = line.addr()
+        instruction = next(disassemble(image.view(addr, min(addr + 3, Image.SIZE)), addr))
+        expected = (line.instr(), line.mode(), line.code())
+        actual = (instruction.instr, instruction.mode, instruction.code)
+        if actual != expected:
+            problems.append(f"Line {line.num()} at ${line.addr():04X}: assembled {expected}, decoded {actual}")
+    return problems
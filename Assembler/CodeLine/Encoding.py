@@ -0,0 +1,45 @@
+class Encoding:
+    """
+    The frozen result of encoding a single instruction. Created once
+    after every symbol has been resolved, so the listing, the object
+    file, and the checksums can all read the same values instead of
+    recomputing them.
+    """
+    __slots__ = ('mode', 'opcode', 'operand', 'length', 'chk', 'error')
+
+    def __init__(self, mode, opcode, operand: bytes, error: str):
+        """
+        Stores the addressing mode, opcode byte, operand bytes, and error
+        code. The length and checksum are derived from them. A Line with
+        an error takes up no memory and contributes nothing to the
+        checksum.
+
+        :param mode: The addressing mode, or None if it couldn't be found
+        :param opcode: The opcode byte, or None if it couldn't be found
+        :param operand: The operand bytes in little-endian order
+        :param error: An error abbreviation, or '' if there is none
+        """
+        chk = 0
+        if not error:
+            chk = opcode
+            for b in operand:
+                chk ^= b
+
+        set_slot = super().__setattr__
+        set_slot('mode', mode)
+        set_slot('opcode', opcode)
+        set_slot('operand', bytes(operand))
+        set_slot('length', 0 if error else 1 + len(operand))
+        set_slot('chk', chk)
+        set_slot('error', error)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Encoding is read-only: {key}")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"Encoding is read-only: {key}")
+
+    def __repr__(self):
+        return "Encoding(mode={!r}, opcode={!r}, operand={!r}, error={!r})".format(
+            self.mode, self.opcode, self.operand, self.error
+        )
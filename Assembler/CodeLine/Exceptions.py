@@ -5,7 +5,11 @@ class CustomException(Exception, ABC):
     """
     An abstract class to base other custom
     exceptions in the CodeLine module on.
+    The message should say which line is at
+    fault, and code is the abbreviation used
+    for the matching Diagnostic.
     """
+    code = ''
 
 
 class BadOpcode(CustomException):
@@ -13,7 +17,7 @@ class BadOpcode(CustomException):
     When raised, signifies that the current
     instruction isn't defined.
     """
-    pass
+    code = 'boc'
 
 
 class BadOperand(CustomException):
@@ -21,7 +25,7 @@ class BadOperand(CustomException):
     When raised, signifies that the current
     operands are invalid.
     """
-    pass
+    code = 'bop'
 
 
 class MemoryFull(CustomException):
@@ -29,4 +33,21 @@ class MemoryFull(CustomException):
     When raised, signifies that the required
     memory has exceeded the available memory.
     """
-    pass
+    code = 'mem'
+
+
+class Overlap(CustomException):
+    """
+    When raised, signifies that the current
+    bytes would overwrite bytes already placed
+    in memory.
+    """
+    code = 'ovl'
+
+
+class BadInclude(CustomException):
+    """
+    When raised, signifies that the current
+    included file can't be read.
+    """
+    code = 'inc'
@@ -0,0 +1,98 @@
+from bisect import bisect_right
+
+from .Exceptions import *
+
+
+class Image:
+    """
+    The assembled program as it sits in the 6502 address space. Bytes
+    are placed into a single 64K buffer, and the occupied ranges are
+    kept sorted and merged so overlapping writes are caught as they
+    happen. Writers read the buffer through memoryviews instead of
+    copying it.
+    """
+    SIZE = 1 << 16
+
+    def __init__(self, fill: int = 0):
+        """
+        :param fill: The byte value of every unoccupied address
+        """
+        self.__data = bytearray([fill]) * Image.SIZE
+        # Sorted, non-adjacent [start, end) ranges of occupied addresses
+        self.__starts = []
+        self.__ends = []
+
+    def write(self, addr: int, data, num: int = 0):
+        """
+        Places bytes in memory. Raises MemoryFull if they run past the
+        end of the address space, and Overlap if any address is already
+        occupied.
+
+        :param addr: The address of the first byte
+        :param data: The bytes to place
+        :param num: The line number, for the error message
+        """
+        end = addr + len(data)
+        if addr == end:
+            return
+        if end > Image.SIZE:
+            raise MemoryFull(f"Memory full in line: {num}")
+
+        i = bisect_right(self.__starts, addr)
+        if (i and self.__ends[i - 1] > addr) or (i < len(self.__starts) and self.__starts[i] < end):
+            raise Overlap(f"Overlapping memory in line: {num}")
+        self.__data[addr:end] = data
+
+        if i and self.__ends[i - 1] == addr:
+            i -= 1
+            self.__ends[i] = end
+        else:
+            self.__starts.insert(i, addr)
+            self.__ends.insert(i, end)
+        if i + 1 < len(self.__starts) and self.__starts[i + 1] == end:
+            self.__ends[i] = self.__ends.pop(i + 1)
+            del self.__starts[i + 1]
+
+    def occupied(self, addr: int):
+        """
+        :param addr: A memory address
+        :return: True if a byte has been placed at the address
+        """
+        i = bisect_right(self.__starts, addr)
+        return bool(i) and self.__ends[i - 1] > addr
+
+    def ranges(self):
+        """
+        :return: The occupied [start, end) ranges in address order
+        """
+        return list(zip(self.__starts, self.__ends))
+
+    def segments(self):
+        """
+        :return: A (start, memoryview) pair for each occupied range, in
+                 address order, without copying
+        """
+        return [(start, self.view(start, end)) for start, end in self.ranges()]
+
+    def span(self):
+        """
+        :return: The lowest and one past the highest occupied address,
+                 or (0, 0) if nothing has been placed
+        """
+        if not self.__starts:
+            return 0, 0
+        return self.__starts[0], self.__ends[-1]
+
+    def view(self, start: int = 0, end: int = SIZE):
+        """
+        :param start: The first address
+        :param end: One past the last address
+        :return: A read-only memoryview of the addresses, without copying
+        """
+        return memoryview(self.__data).toreadonly()[start:end]
+
+    def __len__(self):
+        """
+        :return: The number of occupied addresses
+        """
+        return sum(self.__ends) - sum(self.__starts)
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import re
+
+from .Source import Statement, INCLUDE, prepare, kind
+
+INCLUDE_HINT = re.compile('INCLUDE', re.IGNORECASE)
+"""Finds lines that might be INCLUDE lines, so only those are split"""
+
+
+class IncludeStore:
+    """
+    Keeps every included file already split into Statements, so a
+    header shared by many sources is read and split once per process.
+    Entries are keyed by the real path of the file. A file whose
+    modification time and size haven't changed is reused without
+    reading it; otherwise it is read and hashed, and only split again
+    if the hash has changed too. Statements are never modified once
+    made, so every source including a file shares the same ones.
+    """
+    def __init__(self):
+        # Each real path maps to its (mtime, size, digest, statements)
+        self.__entries = {}
+
+    def statements(self, path: str):
+        """
+        :param path: The name of a source file
+        :return: The file's lines as a tuple of Statements
+        """
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        entry = self.__entries.get(real)
+        if entry is not None and entry[:2] == (st.st_mtime_ns, st.st_size):
+            return entry[3]
+
+        with open(real, 'rb') as in_file:
+            data = in_file.read()
+        digest = hashlib.sha256(data).digest()
+        if entry is not None and entry[2] == digest:
+            statements = entry[3]
+        else:
+            statements = tuple(prepare(line) for line in data.decode().splitlines(keepends=True))
+        self.__entries[real] = (st.st_mtime_ns, st.st_size, digest, statements)
+        return statements
+
+    def digest(self, path: str):
+        """
+        :param path: The name of a source file already read by statements
+        :return: The SHA-256 digest of its contents
+        """
+        return self.__entries[os.path.realpath(path)][2]
+
+    def expand(self, lines, filename: str = None, included=None, _stack=()):
+        """
+        Splices every included file into the source, right after the
+        INCLUDE line naming it, which stays in as a comment. Included
+        files may include others. The path is relative to the directory
+        of the file doing the including. An INCLUDE line that names a
+        file that can't be read, or that would include a file already
+        being included, is left as it is, so the assembler reports it
+        as a bad include.
+
+        :param lines: An iterable of raw lines or Statements
+        :param filename: The name of the source file, or None for the current directory
+        :param included: A list every included path is appended to, or None
+        :param _stack: The real paths of the files being included
+        :return: A generator of raw lines and Statements
+        """
+        directory = '.'
+        if filename is not None:
+            directory = os.path.dirname(filename)
+            _stack += (os.path.realpath(filename),)
+        for line in lines:
+            if not INCLUDE_HINT.search(str(line)):
+                yield line
+                continue
+            statement = prepare(line)
+            if kind(statement) != INCLUDE or not statement.operand:
+                yield line
+                continue
+            path = os.path.join(directory, statement.operand)
+            try:
+                if os.path.realpath(path) in _stack:
+                    raise OSError(f"{path} includes itself")
+                statements = self.statements(path)
+            except (OSError, UnicodeDecodeError):
+                yield statement
+                continue
+            if included is not None:
+                included.append(path)
+            yield Statement(statement.text)
+            yield from self.expand(statements, path, included, _stack)
+
+    def clear(self):
+        """
+        Forgets every file.
+        """
+        self.__entries.clear()
+
+
+STORE = IncludeStore()
+"""The IncludeStore shared by every assembly in the process"""
+
+
+def expand(lines, filename: str = None, included=None):
+    """
+    Splices every included file into the source using the shared
+    IncludeStore.
+
+    :param lines: An iterable of raw lines
+    :param filename: The name of the source file, or None for the current directory
+    :param included: A list every included path is appended to, or None
+    :return: A generator of raw lines and Statements
+    """
+    return STORE.expand(lines, filename, included)
@@ -10,15 +10,11 @@ class Line(ABC):
     def __init__(self, line: str, num: int):
         """
         Stores the raw string and line number.
-        Throws a BadOperand exception if the line length is greater
-        than 64.
 
-        :param line: The raw string
+        :param line: The raw string, or a Statement
         :param num: The line number
         """
-        if len(line) > 64:
-            raise BadOperand()
-        self.__raw = line.rstrip() + '\n'
+        self.__raw = str(line).rstrip() + '\n'
         self.__num = num
 
     def __len__(self):
@@ -55,6 +51,15 @@ class Line(ABC):
         """
         return self.__num
 
+    def renumber(self, num: int):
+        """
+        Moves the Line to a new line number, for when lines are
+        inserted or removed above it.
+
+        :param num: The new line number
+        """
+        self.__num = num
+
     def __str__(self):
         """
         :return: The Line's info a console ready format.
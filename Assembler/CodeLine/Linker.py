@@ -0,0 +1,150 @@
+import os
+
+from .Image import Image
+from .Writers import TEXT, write
+from .Source import START
+
+
+class Linker:
+    """
+    Places the sections of relocatable Modules one after another and
+    fills in every relocated field, giving the same memory Image a
+    whole-program assembly would. Every symbol a module defines is
+    visible to the others; a symbol that several modules define
+    differently is only an error if a module imports it.
+    """
+    def __init__(self, modules: list, origin: int = START):
+        """
+        Every problem found is recorded as a message, and the Linker
+        keeps going past it.
+
+        :param modules: The Modules, in the order their sections are placed
+        :param origin: The address of the first section
+        """
+        self.__modules = list(modules)
+        self.__bases = []
+        self.__symbols = {}
+        self.__errors = []
+        self.__image = Image()
+
+        addr = origin
+        for module in self.__modules:
+            if addr + len(module.code()) > Image.SIZE:
+                self.__errors.append(f"Memory full placing module {module.name()}")
+                break
+            self.__bases.append(addr)
+            addr += len(module.code())
+
+        # Every value each symbol is given, and the first module to give it
+        definitions = {}
+        for module, base in zip(self.__modules, self.__bases):
+            for symbol, (value, relocatable) in module.exports().items():
+                definitions.setdefault(symbol, {}).setdefault(base + value if relocatable else value, module.name())
+        for symbol, values in definitions.items():
+            if len(values) == 1:
+                self.__symbols[symbol] = next(iter(values))
+
+        for i, (module, base) in enumerate(zip(self.__modules, self.__bases)):
+            self.__image.write(base, self.__patch(module, base, definitions), i + 1)
+
+    def __patch(self, module, base: int, definitions: dict):
+        """
+        A helper function that fills in a module's relocated fields.
+
+        :param module: The Module
+        :param base: The address of its section
+        :param definitions: Every value each symbol is given
+        :return: The section's code
+        """
+        code = bytearray(module.code())
+        for relocation in module.relocations():
+            symbol = relocation.symbol
+            if symbol == '':
+                target = base
+            elif symbol is None:
+                target = 0
+            elif symbol not in definitions:
+                self.__errors.append(f"Undefined symbol {symbol} in module {module.name()}")
+                continue
+            elif symbol not in self.__symbols:
+                names = ', '.join(definitions[symbol].values())
+                self.__errors.append(f"Symbol {symbol} in module {module.name()} is defined differently by {names}")
+                continue
+            else:
+                target = self.__symbols[symbol]
+            target += relocation.addend
+
+            offset = relocation.offset
+            if relocation.kind == 'rel':
+                target -= base + offset + 1
+                if not -128 <= target <= 127:
+                    self.__errors.append(f"Branch out of range to {symbol or f'${relocation.addend:04X}'} "
+                                         f"in module {module.name()} at ${base + offset - 1:04X}")
+                    continue
+                code[offset] = target & 0xFF
+            elif relocation.kind == 'zp':
+                if not 0 <= target & 0xFFFF <= 0xFF:
+                    self.__errors.append(f"{symbol or 'Section'} doesn't fit in a byte "
+                                         f"in module {module.name()} at ${base + offset - 1:04X}")
+                    continue
+                code[offset] = target & 0xFF
+            else:
+                code[offset:offset + 2] = (target & 0xFFFF).to_bytes(2, 'little')
+        return code
+
+    def errors(self):
+        """
+        :return: Every problem found, as messages
+        """
+        return self.__errors
+
+    def symbols(self):
+        """
+        :return: The final address or value of every symbol that only has one
+        """
+        return self.__symbols
+
+    def bases(self):
+        """
+        :return: A dict mapping each module's name to the address of its section
+        """
+        return {module.name(): base for module, base in zip(self.__modules, self.__bases)}
+
+    def image(self):
+        """
+        :return: The memory Image holding the linked program
+        """
+        return self.__image
+
+    def records(self):
+        """
+        Generates the text object file records, one per instruction, in
+        the same format as Parser.write_to_file.
+
+        :return: A generator of strings
+        """
+        for module, base in zip(self.__modules, self.__bases):
+            addr = base
+            for size in module.sizes():
+                code = [f"{b:02X}" for b in self.__image.view(addr, addr + size)]
+                yield "{0:X}: {1:2} {2:2} {3:2}".format(addr, *code, '', '', '')
+                addr += size
+
+    def write_to_file(self, filename, fmt: str = TEXT):
+        """
+        Writes the linked program, unless there are errors.
+
+        :param filename: Name of the file to write to
+        :param fmt: TEXT, or one of the keys of Writers.FORMATS
+        :return: True if the file was written
+        """
+        if self.__errors:
+            return False
+        if fmt != TEXT:
+            write(filename, fmt, self.__image.segments())
+            return True
+        temp_name = filename + '.tmp'
+        with open(temp_name, 'w') as out:
+            out.write('\n'.join(self.records()))
+        os.replace(temp_name, filename)
+        return True
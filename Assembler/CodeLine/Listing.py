@@ -0,0 +1,113 @@
+import csv
+import json
+from operator import itemgetter
+
+from .Memory import Memory
+
+EXPORTS = ('json', 'csv')
+"""The formats the listing and symbol table can be exported in"""
+LINE_FIELDS = ('line', 'address', 'code', 'error', 'source')
+"""The fields of each exported Line"""
+SYMBOL_FIELDS = ('name', 'value')
+"""The fields of each exported symbol"""
+
+
+def footer(num_bytes: int, num_errors: int, symbols: dict):
+    """
+    Generates the end of a listing: the byte and error totals followed
+    by the symbol table in alphabetical then numerical order. Joining
+    the generated strings gives the text exactly as it is printed.
+
+    :param num_bytes: The number of bytes assembled
+    :param num_errors: The number of errors found
+    :param symbols: The symbol table, mapping names to integers
+    :return: A generator of strings
+    """
+    yield f"\n--End assembly, {num_bytes} bytes, errors: {num_errors}\n\n"
+
+    alpha = sorted(symbols.items(), key=itemgetter(0))
+    num = sorted(symbols.items(), key=itemgetter(1))
+
+    for title, table, end in (("alphabetical", alpha, "\n"), ("numerical", num, "")):
+        yield f"Symbol table - {title} order:\n"
+        curr_line = '    '
+        for i, (k, v) in enumerate(table, 1):
+            curr_line += "{:<9}{:<9}".format(k, f"=${v:02X}")
+            if i % 4 == 0:
+                yield curr_line + "\n"
+                curr_line = '    '
+        yield curr_line + end
+
+
+def line_rows(lines):
+    """
+    Converts Lines into rows for export. Lines that take up no memory
+    have no address.
+
+    :param lines: An iterable of Lines
+    :return: A generator of dicts with the keys in LINE_FIELDS
+    """
+    for line in lines:
+        address = code = None
+        if isinstance(line, Memory):
+            address = f"{line.addr():04X}"
+            code = line.code().hex(' ').upper()
+        yield {'line': line.num(), 'address': address, 'code': code,
+               'error': line.error() or None, 'source': line.raw().rstrip('\r\n')}
+
+
+def symbol_rows(symbols: dict):
+    """
+    :param symbols: The symbol table, mapping names to integers
+    :return: A generator of dicts with the keys in SYMBOL_FIELDS
+    """
+    for name, value in symbols.items():
+        yield {'name': name, 'value': value}
+
+
+def export_format(filename: str):
+    """
+    :param filename: The name of the file to export to
+    :return: The export format given by its extension
+    """
+    fmt = filename.rsplit('.', 1)[-1].lower()
+    if fmt not in EXPORTS:
+        raise ValueError(f"Can't export to {filename}: the extension must be one of {', '.join(EXPORTS)}")
+    return fmt
+
+
+def export(out, rows, fields: tuple, fmt: str):
+    """
+    Writes rows to a text stream one at a time, so nothing is held in
+    memory. JSON is written as an array of objects, and CSV as a
+    header followed by one record per row.
+
+    :param out: A text stream
+    :param rows: An iterable of dicts
+    :param fields: The keys of each row, in column order
+    :param fmt: One of EXPORTS
+    """
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fields, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    sep = '[\n'
+    for row in rows:
+        out.write(sep + json.dumps(row))
+        sep = ',\n'
+    out.write('[]\n' if sep == '[\n' else '\n]\n')
+
+
+def export_to_file(filename: str, rows, fields: tuple):
+    """
+    Exports rows to a file in the format given by its extension. See
+    export.
+
+    :param filename: The name of the file to write to
+    :param rows: An iterable of dicts
+    :param fields: The keys of each row, in column order
+    """
+    fmt = export_format(filename)
+    with open(filename, 'w', newline='') as out:
+        export(out, rows, fields, fmt)
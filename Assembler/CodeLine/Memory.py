@@ -10,15 +10,13 @@ class Memory(Line, ABC):
     def __init__(self, line: str, addr: int, num):
         """
         Stores the raw string, line number, address, and optional label.
-        Throws a BadOperand exception if the line length is greater
-        than 64.
 
-        :param line: The raw string
+        :param line: A Statement
         :param addr: The memory address
         :param num: The line number
         """
         super().__init__(line, num)
-        self.__symbol = line[0:9].strip()
+        self.__symbol = line.label
         self.__addr = addr
 
     @abstractmethod
@@ -44,6 +42,13 @@ class Memory(Line, ABC):
         """
         return self.__symbol
 
+    @abstractmethod
+    def code(self):
+        """
+        :return: The machine code as bytes, empty if there is an error.
+        """
+        pass
+
     @abstractmethod
     def assembly(self):
         """
@@ -0,0 +1,324 @@
+import json
+from collections import ChainMap
+
+from .Opcode import Opcode, SUPPORTED, REL, HEADS, TAILS, TAILS_3, classify, instr_params
+from .Op_Param import compile_expr, operand_expr
+from .Memory import Memory
+from .Parser import Parser
+from .Diagnostic import Diagnostic
+from .Source import *
+
+FORMAT = 'T34 relocatable'
+"""The format name at the top of every relocatable object"""
+VERSION = 1
+"""The version of the format, bumped whenever it changes"""
+EXTENSION = '.rel'
+"""The extension of a relocatable object"""
+KINDS = ('abs', 'zp', 'rel')
+"""The kinds of relocated field: a 16-bit address, a zero page or
+immediate byte, and a branch offset"""
+ABS_PROBE = int('C000', 16)
+"""The value an imported symbol has while its module is assembled"""
+ZP_PROBE = int('10', 16)
+"""The value an imported symbol has if it's used as an immediate or in
+a zero page indirect mode, where only a byte fits"""
+SHIFTS = (int('40', 16), int('1234', 16))
+"""How far the section and each import are moved to find out which of
+them a value moves with"""
+
+
+class Relocation:
+    """
+    A field in a module's code that the linker fills in once the
+    sections are placed: the address of the module's own section, of
+    an imported symbol, or of neither, plus an addend.
+    """
+    __slots__ = ('offset', 'kind', 'symbol', 'addend')
+
+    def __init__(self, offset: int, kind: str, symbol, addend: int):
+        """
+        :param offset: The offset of the field in the section
+        :param kind: One of KINDS
+        :param symbol: The imported symbol, '' for the module's own section,
+                       or None for an absolute branch target
+        :param addend: The value added to the address of the symbol or section
+        """
+        self.offset = offset
+        self.kind = kind
+        self.symbol = symbol
+        self.addend = addend
+
+
+class Module:
+    """
+    A relocatable object: the code of a single module assembled as one
+    section that can be placed anywhere, the symbols it exports and
+    imports, and the fields the linker has to fill in.
+    """
+    def __init__(self, name: str, code: bytes, sizes: list, exports: dict, imports: list, relocations: list):
+        """
+        :param name: The name of the module
+        :param code: The contents of the section
+        :param sizes: The length of each instruction in the section, in order
+        :param exports: A dict mapping every symbol the module defines to its value
+                        and whether it's an offset into the section
+        :param imports: The symbols the module uses but doesn't define
+        :param relocations: The Relocations, in order of their offsets
+        """
+        self.__name = name
+        self.__code = bytes(code)
+        self.__sizes = list(sizes)
+        self.__exports = exports
+        self.__imports = list(imports)
+        self.__relocations = list(relocations)
+
+    def name(self):
+        """
+        :return: The name of the module
+        """
+        return self.__name
+
+    def code(self):
+        """
+        :return: The contents of the section
+        """
+        return self.__code
+
+    def sizes(self):
+        """
+        :return: The length of each instruction in the section
+        """
+        return self.__sizes
+
+    def exports(self):
+        """
+        :return: A dict mapping each symbol to its value and whether it's relocatable
+        """
+        return self.__exports
+
+    def imports(self):
+        """
+        :return: The symbols the module uses but doesn't define
+        """
+        return self.__imports
+
+    def relocations(self):
+        """
+        :return: The Relocations
+        """
+        return self.__relocations
+
+    def to_dict(self):
+        """
+        :return: The Module as a JSON ready dict
+        """
+        return {
+            'format': FORMAT,
+            'version': VERSION,
+            'name': self.__name,
+            'code': self.__code.hex().upper(),
+            'sizes': self.__sizes,
+            'exports': {name: [value, relocatable] for name, (value, relocatable) in self.__exports.items()},
+            'imports': self.__imports,
+            'relocations': [[r.offset, r.kind, r.symbol, r.addend] for r in self.__relocations],
+        }
+
+    @staticmethod
+    def from_dict(data: dict):
+        """
+        Will raise a ValueError if the dict isn't a relocatable object.
+
+        :param data: A dict returned by to_dict
+        :return: The Module
+        """
+        if data.get('format') != FORMAT or data.get('version') != VERSION:
+            raise ValueError('Not a relocatable object, or from another version')
+        return Module(
+            data['name'], bytes.fromhex(data['code']), data['sizes'],
+            {name: (value, relocatable) for name, (value, relocatable) in data['exports'].items()},
+            data['imports'], [Relocation(*r) for r in data['relocations']]
+        )
+
+    def write_to_file(self, filename):
+        """
+        :param filename: Name of the file to write to
+        """
+        with open(filename, 'w') as out:
+            json.dump(self.to_dict(), out)
+
+    @staticmethod
+    def read(filename: str):
+        """
+        :param filename: The name of a relocatable object
+        :return: The Module
+        """
+        with open(filename) as in_file:
+            return Module.from_dict(json.load(in_file))
+
+
+def _zero_page(params: str):
+    """
+    :param params: The parameters of an instruction
+    :return: True if the syntax only leaves room for a byte
+    """
+    shape = classify(params)
+    if not shape:
+        return False
+    head, tail = divmod(shape - 1, TAILS)
+    return head == HEADS['#'] or head == HEADS['('] and tail in TAILS_3.values()
+
+
+def _moves_with(expr, symbols, addr: int, movable: set, imports: dict):
+    """
+    Finds out what a value has to be relocated by, by moving the
+    section and each import in turn and seeing how the value changes.
+    Will raise a ValueError if it changes in any other way, as when a
+    relocatable address is multiplied or masked.
+
+    :param expr: The compiled Expression
+    :param symbols: Every symbol, with imports at their probe values
+    :param addr: The current memory address
+    :param movable: The symbols that are addresses in the section
+    :param imports: The imported symbols
+    :return: The import the value moves with, '' for the section, or
+             None if it doesn't move, and the value itself
+    """
+    value = expr.evaluate(symbols, addr)
+    found = None
+    for candidate in ('', *dict.fromkeys(n for n in expr.names if n in imports)):
+        moved = []
+        for shift in SHIFTS:
+            if candidate:
+                shifted = {candidate: symbols[candidate] + shift}
+                at = addr
+            else:
+                shifted = {n: symbols[n] + shift for n in expr.names if n in movable}
+                at = addr + shift
+            moved.append(expr.evaluate(ChainMap(shifted, symbols), at) - value)
+        if not any(moved):
+            continue
+        if moved != list(SHIFTS) or found is not None:
+            raise ValueError(f"Can't relocate: {expr.text!r}")
+        found = candidate
+    return found, value
+
+
+def assemble_module(str_lines: list, name: str):
+    """
+    Assembles a module into a relocatable object. The module is
+    assembled as a single section at $8000, with every symbol it uses
+    but doesn't define imported. Imports are assumed to be 16-bit
+    addresses, unless they are used as an immediate or in a zero page
+    indirect mode. Every symbol the module defines is exported. Each
+    operand that depends on where the section or an import ends up is
+    recorded as a Relocation. ORG and CHK lines aren't allowed, since
+    the linker decides the addresses and the bytes. The module is
+    relaxed, so each forward reference takes exactly the space it
+    needs and the section has no gaps: its code is copied as it is, so
+    every offset, branch and export has to match the addresses it was
+    assembled at.
+
+    :param str_lines: A list of lines taken from the source code
+    :param name: The name of the module
+    :return: The Module, or None if there are errors, and the list of Diagnostics
+    """
+    statements = [prepare(line) for line in str_lines]
+    defined = set()
+    used = {}
+    diagnostics = []
+    for num, statement in enumerate(statements, 1):
+        line_kind = kind(statement)
+        if line_kind in (ORIGIN, CHECKSUM):
+            message = f"{statement.instr} isn't allowed in a relocatable module in line: {num}"
+            diagnostics.append(Diagnostic(num, 'boc', message))
+        if line_kind == NOPCODE or line_kind == ORIGIN:
+            continue
+        if statement.label:
+            defined.add(statement.label)
+        params = statement.operand if line_kind == EQU else instr_params(statement)
+        try:
+            names = compile_expr(params if line_kind == EQU else operand_expr(params)).names if params else ()
+        except ValueError:
+            continue
+        zero_page = line_kind == OPCODE and _zero_page(params)
+        for n in names:
+            used[n] = used.get(n, False) or zero_page
+
+    imports = {n: ZP_PROBE if zero_page else ABS_PROBE for n, zero_page in used.items() if n not in defined}
+    # A branch to an import can't be assembled before the import is
+    # placed, so it's assembled as a branch to itself and filled in later
+    branches = {}
+    for i, statement in enumerate(statements):
+        if kind(statement) == OPCODE and SUPPORTED.get(statement.instr, 0) & REL and statement.operand:
+            try:
+                expr = compile_expr(operand_expr(statement.operand))
+            except ValueError:
+                continue
+            if any(n in imports for n in expr.names):
+                branches[i + 1] = expr
+                statements[i] = Statement(statement.text, statement.label, statement.instr, '*')
+
+    parser = Parser(statements, False, base=imports, relax=True)
+    diagnostics += parser.diagnostics()
+    symbols = ChainMap(parser.symbols(), imports)
+    movable = set()
+    exports = {}
+    code = bytearray()
+    sizes = []
+    relocations = []
+    curr = START
+    for line in parser.lines():
+        if isinstance(line, Memory) and line.code() and line.symbol():
+            movable.add(line.symbol())
+    for line in parser.lines():
+        num = line.num()
+        statement = statements[num - 1]
+        if kind(statement) == EQU and statement.label in parser.symbols():
+            try:
+                base, _ = _moves_with(compile_expr(statement.operand), symbols, curr, movable, imports)
+            except ValueError:
+                diagnostics.append(Diagnostic(num, 'bop', f"Bad relocatable operand in line: {num}"))
+                continue
+            if base:
+                diagnostics.append(Diagnostic(num, 'bop', f"Bad relocatable operand in line: {num}"))
+            elif base == '':
+                movable.add(statement.label)
+            continue
+        if not isinstance(line, Memory) or not line.code():
+            continue
+        offset = line.addr() - START
+        if offset != len(code):
+            # Only if relaxing didn't settle, which leaves a forward reference with room to spare
+            message = f"Can't lay out the forward references of a relocatable module in line: {num}"
+            diagnostics.append(Diagnostic(num, 'bop', message))
+            break
+        code += line.code()
+        sizes.append(len(line.code()))
+        curr = line.addr() + len(line.code())
+        if not isinstance(line, Opcode) or not line.params():
+            continue
+
+        expr = branches.get(num) or compile_expr(operand_expr(line.params()))
+        if not expr.relative:
+            continue
+        try:
+            base, value = _moves_with(expr, symbols, line.addr(), movable, imports)
+        except ValueError:
+            diagnostics.append(Diagnostic(num, 'bop', f"Bad relocatable operand in line: {num}"))
+            continue
+        if line.mode() == 'rel':
+            # A branch within the section is the same wherever it's placed
+            if base is None:
+                relocations.append(Relocation(offset + 1, 'rel', None, value))
+            elif base:
+                relocations.append(Relocation(offset + 1, 'rel', base, value - imports[base]))
+        elif base is not None:
+            addend = value - (imports[base] if base else START)
+            relocations.append(Relocation(offset + 1, 'abs' if len(line.code()) == 3 else 'zp', base, addend))
+
+    if diagnostics:
+        return None, sorted(diagnostics, key=lambda d: d.line)
+    for symbol, value in parser.symbols().items():
+        relocatable = symbol in movable
+        exports[symbol] = (value - START if relocatable else value, relocatable)
+    return Module(name, code, sizes, exports, list(imports), relocations), []
@@ -1,8 +1,28 @@
 from .Line import Line
+from .Diagnostic import Diagnostic
 
 
 class NOpcode(Line):
     """
     A type of Line that is not included in the object file.
+    Also stands in for a line that couldn't be assembled
+    when the Parser keeps going past errors.
     """
-    pass
+    def __init__(self, line: str, num: int, error: str = ''):
+        """
+        Stores the raw string, line number, and optional error.
+
+        :param line: The raw string
+        :param num: The line number
+        :param error: An error abbreviation, or '' if there is none
+        """
+        super().__init__(line, num)
+        self.__error = error
+
+    def error(self):
+        return self.__error
+
+    def __str__(self):
+        if self.__error:
+            return "{}\n{}".format(Diagnostic.message_for(self.__error, self.num()), super().__str__())
+        return super().__str__()
@@ -1,3 +1,66 @@
+import re
+from functools import lru_cache
+from operator import add, sub, mul, and_, or_, xor
+
+TOKEN = re.compile(r"""
+    \$[0-9A-Fa-f]*                    # hex
+  | %[01]*                            # binary
+  | [Oo][0-7]+(?![A-Za-z0-9_])        # octal
+  | '.'?                              # single quoted ASCII
+  | ".?"?                             # double quoted ASCII
+  | [A-Za-z_][A-Za-z0-9_]*            # identifier
+  | [0-9]+                            # decimal
+  | .                                 # operator or punctuation
+""", re.VERBOSE)
+OCTAL = re.compile(r"[Oo][0-7]+")
+
+
+def div(val1: int, val2: int):
+    """
+    Integer division that truncates toward zero, matching the
+    original int(val1 / val2) without going through a float.
+    """
+    quot = abs(val1) // abs(val2)
+    return -quot if (val1 < 0) != (val2 < 0) else quot
+
+
+OPERATORS = {
+    '+': add,
+    '-': sub,
+    '*': mul,
+    '/': div,
+    '&': and_,
+    '.': or_,
+    '!': xor
+}
+
+
+def tokenize(expr: str):
+    """
+    Splits an operand into number, identifier, operator, and
+    punctuation tokens. Joining the tokens gives back the operand.
+
+    :param expr: an operand in string form
+    :return: the list of tokens
+    """
+    return TOKEN.findall(expr)
+
+
+def is_symbol(tokens: list, i: int):
+    """
+    Determines if the token at the given index refers to a symbol.
+    Identifiers following a comma name the X or Y register instead.
+
+    :param tokens: a tokenized operand
+    :param i: the index of the token to check
+    :return: True if the token is a symbol reference
+    """
+    token = tokens[i]
+    if not (token[0].isalpha() or token[0] == '_') or OCTAL.fullmatch(token):
+        return False
+    return i == 0 or tokens[i - 1] != ','
+
+
 def to_dec(num: str):
     """
     Converts a string encoded number without any operands into an
@@ -24,80 +87,149 @@ def to_dec(num: str):
         return int(num[1:], 2)
     if num.startswith(("'", '"')):
         num = num.replace("'", "").replace('"', '')
+        if len(num) != 1:
+            raise ValueError(f"Bad character constant: {num!r}")
         return ord(num)
     else:
         return int(num)
 
 
-def op_params(expr: str):
+def operand_expr(params: str):
+    """
+    Strips the addressing mode syntax from an instruction's parameters,
+    leaving only the expression. For example, "(PTR+1),Y" gives "PTR+1".
+
+    :param params: the parameters of an instruction
+    :return: the expression in string form
+    """
+    return params.split(',')[0].removeprefix('(').removeprefix('#').removesuffix(')')
+
+
+class Expression:
+    """
+    A compiled operand expression. Evaluates straight to an integer
+    given a symbol table and the current address.
     """
-    Converts a string encoded math expression and converts it to a
-    hexadecimal string. Supports the following operations:
+    __slots__ = ('text', 'names', 'relative', 'value', '__fn')
 
-    * \+ addition
-    * \- subtraction
-    * \* multiplication
+    def __init__(self, text: str, names: tuple, relative: bool, value, fn):
+        """
+        :param text: The source of the expression
+        :param names: The symbols the expression refers to
+        :param relative: True if the expression refers to a symbol or the current address
+        :param value: The folded value if the expression is constant, otherwise None
+        :param fn: A function taking the symbol table and address that evaluates the expression
+        """
+        self.text = text
+        self.names = names
+        self.relative = relative
+        self.value = value
+        self.__fn = fn
+
+    def evaluate(self, symbols: dict, addr: int = 0):
+        """
+        Evaluates the expression. Will raise a ValueError if a symbol
+        is undefined or there is a division by zero.
+
+        :param symbols: The symbol table, mapping names to integers
+        :param addr: The current memory address, used for "*"
+        :return: The value of the expression
+        """
+        if self.value is not None:
+            return self.value
+        try:
+            return self.__fn(symbols, addr)
+        except KeyError as e:
+            raise ValueError(f"Undefined symbol: {e}")
+        except ZeroDivisionError as e:
+            raise ValueError(e)
+
+
+def _term(token: str):
+    """
+    Compiles a single primitive token.
+
+    :param token: A number, identifier, or "*"
+    :return: A function taking the symbol table and address, and the constant value or None
+    """
+    if token == '*':
+        return (lambda symbols, addr: addr), None
+    if is_symbol([token], 0):
+        return (lambda symbols, addr: symbols[token]), None
+    val = to_dec(token)
+    return (lambda symbols, addr: val), val
+
+
+@lru_cache(maxsize=4096)
+def compile_expr(expr: str):
+    """
+    Compiles a string encoded math expression into an Expression.
+    Operations are done from left to right with no precedence.
+    Supports the following operations:
+
+    * \\+ addition
+    * \\- subtraction
+    * \\* multiplication
     * / division
     * & bit-wise AND
     * . bit-wise OR
     * ! bit-wise XOR
 
-    Will raise a ValueError if there are spaces in the string.
+    A "*" in place of a number stands for the current address.
+    Leading constants are folded, so a constant expression is
+    evaluated only once. Compiled expressions are cached by text.
+
+    Will raise a ValueError if the expression is malformed.
 
     :param expr: a mathematical expression in string form
-    :return: the calculated expression as a hex string
+    :return: the compiled Expression
     """
-    op = []
-    num = []
-    expr = expr.split(',')[0]
+    tokens = tokenize(expr)
+    if len(tokens) % 2 == 0:
+        raise ValueError(f"Bad expression: {expr!r}")
 
-    if not {'+', '-', '*', '/', '&', '!', '.'}.intersection(set(expr)):
-        if expr:
-            expr = to_dec(expr)
-            return hex(expr).removeprefix('0x').upper()
+    names = tuple(t for i, t in enumerate(tokens) if i % 2 == 0 and is_symbol(tokens, i))
+    relative = bool(names) or '*' in tokens[::2]
+
+    first, value = _term(tokens[0])
+    steps = []
+    for i in range(1, len(tokens), 2):
+        op = OPERATORS.get(tokens[i])
+        if op is None:
+            raise ValueError(f"Bad operator in expression: {expr!r}")
+        get, const = _term(tokens[i + 1])
+        if not steps and value is not None and const is not None:
+            try:
+                value = op(value, const)
+            except ZeroDivisionError:
+                raise ValueError(f"Division by zero: {expr!r}")
         else:
-            return ''
-
-    def split_op(operation: str):
-        nonlocal expr
-        op.append(operation)
-        p = expr.rsplit(operation, 1)
-        num.append(p[1])
-        expr = p[0]
-
-    for letter in reversed(expr):
-        if letter == ".":
-            split_op(".")
-        elif letter == '!':
-            split_op('!')
-        elif letter == '&':
-            split_op('&')
-        elif letter == '-':
-            split_op('-')
-        elif letter == '+':
-            split_op('+')
-        elif letter == '/':
-            split_op('/')
-        elif letter == '*':
-            split_op('*')
-    num.append(expr)
-
-    for o in reversed(op):
-        val1 = to_dec(num.pop())
-        val2 = to_dec(num.pop())
-        if o == '.':
-            num.append(str(val1 | val2))
-        elif o == '!':
-            num.append(str(val1 ^ val2))
-        elif o == '&':
-            num.append(str(val1 & val2))
-        elif o == '-':
-            num.append(str(val1 - val2))
-        elif o == '+':
-            num.append(str(val1 + val2))
-        elif o == '/':
-            num.append(str(int(val1 / val2)))
-        elif o == '*':
-            num.append(str(val1 * val2))
-
-    return hex(int(num.pop())).removeprefix('0x').upper()
+            steps.append((op, get))
+
+    if not steps:
+        return Expression(expr, names, relative, value, first)
+    if value is not None:
+        first = (lambda symbols, addr: value)
+
+    def fn(symbols, addr):
+        val = first(symbols, addr)
+        for op, get in steps:
+            val = op(val, get(symbols, addr))
+        return val
+
+    return Expression(expr, names, relative, None, fn)
+
+
+def op_params(expr: str):
+    """
+    Converts a string encoded math expression without any symbols
+    into a hexadecimal string. See compile_expr for the supported
+    operations.
+
+    :param expr: a mathematical expression in string form
+    :return: the calculated expression as a hex string
+    """
+    expr = operand_expr(expr)
+    if not expr:
+        return ''
+    return hex(compile_expr(expr).evaluate({})).removeprefix('0x').upper()
@@ -1,5 +1,8 @@
 from .Memory import Memory
-from .Op_Param import op_params
+from .Encoding import Encoding
+from .Diagnostic import Diagnostic
+from .Op_Param import compile_expr, operand_expr
+from .Source import comment_operand
 from .Exceptions import *
 
 
@@ -9,6 +12,11 @@ class Opcode(Memory):
     The standard Lines that get written to the object file.
     Should always have a memory address and an instruction.
     The exception is Checksum because it behaves differently.
+
+    TABLE is the readable source of the opcodes. It's compiled into
+    the integer tables below the class when the module is imported.
+    CYCLES gives the cycles each instruction takes in each mode, not
+    counting the extra cycles for crossing a page or taking a branch.
     """
     TABLE = {
         'ADC': {
@@ -208,47 +216,146 @@ class Opcode(Memory):
         'TYA': {'imp': '98'}
     }
 
+    CYCLES = {
+        'ADC': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'AND': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'ASL': {'acc': 2, 'zrp': 5, 'zpx': 6, 'abs': 6, 'abx': 7},
+        'BCC': {'rel': 2},
+        'BCS': {'rel': 2},
+        'BEQ': {'rel': 2},
+        'BIT': {'zrp': 3, 'abs': 4},
+        'BMI': {'rel': 2},
+        'BNE': {'rel': 2},
+        'BPL': {'rel': 2},
+        'BRK': {'imp': 7},
+        'BVC': {'rel': 2},
+        'BVS': {'rel': 2},
+        'CLC': {'imp': 2},
+        'CLD': {'imp': 2},
+        'CLI': {'imp': 2},
+        'CLV': {'imp': 2},
+        'CMP': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'CPX': {'imm': 2, 'zrp': 3, 'abs': 4},
+        'CPY': {'imm': 2, 'zrp': 3, 'abs': 4},
+        'DEC': {'zrp': 5, 'zpx': 6, 'abs': 6, 'abx': 7},
+        'DEX': {'imp': 2},
+        'DEY': {'imp': 2},
+        'EOR': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'INC': {'zrp': 5, 'zpx': 6, 'abs': 6, 'abx': 7},
+        'INX': {'imp': 2},
+        'INY': {'imp': 2},
+        'JMP': {'abs': 3, 'ind': 5},
+        'JSR': {'abs': 6},
+        'LDA': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'LDX': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'aby': 4},
+        'LDY': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4},
+        'LSR': {'acc': 2, 'zrp': 5, 'zpx': 6, 'abs': 6, 'abx': 7},
+        'NOP': {'imp': 2},
+        'ORA': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'PHA': {'imp': 3},
+        'PHP': {'imp': 3},
+        'PLA': {'imp': 4},
+        'PLP': {'imp': 4},
+        'ROL': {'acc': 2, 'zrp': 5, 'zpx': 6, 'abs': 6, 'abx': 7},
+        'ROR': {'acc': 2, 'zrp': 5, 'zpx': 6, 'abs': 6, 'abx': 7},
+        'RTI': {'imp': 6},
+        'RTS': {'imp': 6},
+        'SBC': {'imm': 2, 'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 4, 'aby': 4, 'inx': 6, 'iny': 5},
+        'SEC': {'imp': 2},
+        'SED': {'imp': 2},
+        'SEI': {'imp': 2},
+        'STA': {'zrp': 3, 'zpx': 4, 'abs': 4, 'abx': 5, 'aby': 5, 'inx': 6, 'iny': 6},
+        'STX': {'zrp': 3, 'zpy': 4, 'abs': 4},
+        'STY': {'zrp': 3, 'zpx': 4, 'abs': 4},
+        'TAX': {'imp': 2},
+        'TAY': {'imp': 2},
+        'TSX': {'imp': 2},
+        'TXA': {'imp': 2},
+        'TXS': {'imp': 2},
+        'TYA': {'imp': 2}
+    }
+
     def __init__(self, line: str, addr, symbols: dict, num):
         """
         First, stores the raw string, line number, address, optional label,
-        instruction, and parameters. Then, replaces any symbol it can with the
-        corresponding value. Finally, marks any symbols that need to replaced
-        later. Throws a BadOperand exception if the line length is greater
-        than 64.
+        instruction, parameters, and compiled operand expression. Then,
+        evaluates the expression if every symbol it uses is defined.
+        Otherwise, marks the Line so the symbols can be replaced later.
+        See instr_params for when the operand is a comment instead.
 
-        :param line: The raw string
+        :param line: A Statement
         :param addr: The memory address
         :param symbols: The latest symbol table
         :param num: The line number
         """
         super().__init__(line, addr, num)
 
-        self.__instr = line[9:14].strip()
-        self.__params = line[14:25].strip()
+        self.__instr = line.instr
+        self.__params = instr_params(line)
+        self.__shape = classify(self.__params)
+        self.__expr = None
+        self.__value = None
+        self.__unresolved = ()
         self.__missing = False
+        self.__encoding = None
+        # The branch target, and whether the branch is lengthened into
+        # the opposite branch over a JMP to it
+        self.__target = None
+        self.__long = False
+        self.__evaluations = 0
+
+        if self.__params:
+            try:
+                self.__expr = compile_expr(operand_expr(self.__params))
+            except ValueError:
+                pass
+        self.__resolve(symbols)
+
+    def __resolve(self, symbols: dict):
+        """
+        A helper function that evaluates the operand expression. Marks
+        the Line as missing if any symbol is undefined or the expression
+        can't be evaluated yet.
 
-        temp = sorted(symbols.items(), key=lambda symbol: len(symbol[0]), reverse = True)
-        for k, v in temp:
-            if k in self.__params:
-                val = int(v, 16)
-                if 'rel' in self.__get_modes():
-                    val = self.__abs_to_rel(val)
+        :param symbols: The latest symbol table
+        """
+        if self.__expr is None:
+            self.__missing = bool(self.__params)
+            return
 
-                hex_val = hex(val).replace('0x', '$').upper()
-                self.__params = self.__params.replace(k, hex_val)
+        self.__unresolved = tuple(n for n in self.__expr.names if n not in symbols)
+        self.__missing = bool(self.__unresolved)
+        if self.__missing:
+            return
 
+        self.__evaluations += 1
         try:
-            params = self.params_to_op()
-            if params:
-                int(params, 16)
-        except (ValueError, BadOperand):
+            val = self.__expr.evaluate(symbols, self.addr())
+        except ValueError:
             self.__missing = True
+            return
+        if self.__expr.relative and self.__modes() & REL:
+            self.__target = val & 0xFFFF
+            val = self.__abs_to_rel(val)
+        self.__value = val
+
+    def value(self):
+        """
+        :return: The value of the parameters, or None if it isn't known
+        """
+        return self.__value
 
-    def params_to_op(self):
+    def evaluations(self):
         """
-        :return: The parameters as a hex string
+        :return: The number of times the operand expression has been evaluated
         """
-        return op_params(self.params())
+        return self.__evaluations
+
+    def names(self):
+        """
+        :return: The names of the symbols the parameters refer to
+        """
+        return self.__expr.names if self.__expr is not None else ()
 
     def instr(self):
         """
@@ -262,145 +369,213 @@ class Opcode(Memory):
         """
         return self.__params
 
-    def __get_modes(self):
+    def __modes(self):
         """
         Retrieves the addressing modes associated with the
         instruction. If the instruction isn't in the opcode table, a
         BadOpcode error is raised.
 
-        :return: The addressing modes associated with the instruction.
+        :return: The bitmask of the instruction's addressing modes
         """
         try:
-            return Opcode.TABLE.get(self.instr()).keys()
-        except AttributeError:
-            print(f"Bad opcode in line: {self.num()}")
-            raise BadOpcode()
+            return SUPPORTED[self.__instr]
+        except KeyError:
+            raise BadOpcode(f"Bad opcode in line: {self.num()}")
 
-    def byte_params(self):
+    def __operand(self):
         """
-        Converts the parameters into byte code. If there is a
-        Bad Branch error, then dummy bytes are returned.
+        Converts the value of the parameters into little-endian operand
+        bytes. Values that fit in a byte take one byte, anything else
+        takes two. If the value isn't known yet, dummy bytes are returned.
 
         If the instruction isn't in the opcode table, a BadOpcode
-        error is raised. If the parameters can't be converted to
-        hex, a BadOperand error is raised.
+        error is raised. If the parameters can't be evaluated, a
+        BadOperand error is raised.
 
-        :return: The parameters in byte code form
+        :return: The operand bytes
         """
-        i = 0
-        byte_params = []
+        if self.__long:
+            target = b'\x01\x02' if self.__missing or self.__target is None else self.__target.to_bytes(2, 'little')
+            return bytes((3, OPCODES[('JMP', 'abs')])) + target
         if self.__missing:
-            if 'rel' in self.__get_modes():
-                return ['1', '']
+            if self.__modes() & REL:
+                return b'\x01'
             else:
-                return ['1', '2']
+                return b'\x01\x02'
 
-        try:
-            params = self.params_to_op()
-        except ValueError as e:
-            print(f"Bad operand in line: {self.num()}")
-            raise BadOperand(e)
-        if len(params) % 2 == 1:
-            params = f"0{params}"
-        while i < 2 and params:
-            byte_params.append(params[len(params) - 2:])
-            params = params[:len(params) - 2]
-            i += 1
+        if not self.__params:
+            return b''
+        if self.__value is None:
+            raise BadOperand(f"Bad operand in line: {self.num()}")
 
-        while len(byte_params) < 2:
-            byte_params.append('')
-        return byte_params
+        if self.__value > 0xFFFF and self.__modes() & REL:
+            # A branch out of range, even if it's short of a page
+            return (self.__value & 0xFFFF).to_bytes(2, 'little')
+        val = self.__value & 0xFFFF
+        return val.to_bytes(1 if val <= 0xFF else 2, 'little')
 
     def __abs_to_rel(self, val):
         """
         A helper function that converts the given absolute address
-        to a relative address.
+        to a relative address. An address that is out of range gives
+        a value that doesn't fit in a byte.
 
         :param val: An absolute address
         :return: val as a relative address
         """
         val -= self.addr() + 2
-        if val < 0:
-            val = 256 + val
+        if -128 <= val <= 127:
+            return val & 0xFF
+        return val & 0xFFFF | 0x10000
 
-        return val
+    def lengthen(self):
+        """
+        Turns a branch into the opposite branch over a JMP to the
+        target, which can reach anywhere. Must be called before the
+        Line is encoded.
+        """
+        if self.__modes() & REL:
+            self.__long = True
+
+    def long(self):
+        """
+        :return: True if the branch has been lengthened
+        """
+        return self.__long
 
     def replace_symbols(self, symbols: dict):
         """
-        Finds and replaces any symbol that wasn't replaced in the first scan.
+        Replaces any symbol that wasn't found in the first scan.
 
         :param symbols: The final symbol table
         """
         if not self.__missing:
             return
-        else:
-            self.__missing = False
-        match = ('', '')
-        for k, v in symbols.items():
-            if k in self.params() and len(k) > len(match[0]):
-                match = (k, v)
+        self.__resolve(symbols)
+        self.__missing = False
 
-        if match[0]:
-            val = int(match[1], 16)
-            if 'rel' in self.__get_modes():
-                val = self.__abs_to_rel(val)
+    def missing(self):
+        """
+        :return: True if the Line still needs replace_symbols to be called
+        """
+        return self.__missing
+
+    def unresolved(self):
+        """
+        :return: The names of the symbols that haven't been replaced yet
+        """
+        return self.__unresolved
 
-            hex_val = hex(val).replace('0x', '$').upper()
-            self.__params = self.__params.replace(match[0], hex_val)
+    def __mode(self):
+        """
+        Determines the mode of the instruction from the shape of its
+        parameters and the size of its operand.
 
-    def mode(self):
+        :return: The addressing mode, or None if none of them fit
         """
-        Determines the mode of the instruction based on what modes are in the
-        instruction's opcode table.
-
-        :return:
-        """
-        modes = self.__get_modes()
-        byte_params = self.byte_params()
-
-        if 'imp' in modes and not self.params():
-            return 'imp'
-        elif 'acc' in modes and not self.params():
-            return 'acc'
-        elif 'imm' in modes and self.params().startswith('#'):
-            return 'imm'
-        elif self.params().startswith('('):
-            if 'iny' in modes and self.params().endswith("),Y"):
-                return 'iny'
-            if 'inx' in modes and self.params().endswith(",X)"):
-                return 'inx'
-            if 'ind' in modes:
-                return 'ind'
-        elif self.params().endswith(',X'):
-            if 'zpx' in modes and (self.__missing or not byte_params[1]):
-                return 'zpx'
-            if 'abx' in modes and byte_params[1]:
-                return 'abx'
-        elif self.params().endswith(',Y'):
-            if 'zpy' in modes and (self.__missing or not byte_params[1]):
-                return 'zpy'
-            if 'aby' in modes and byte_params[1]:
-                return 'aby'
-        elif 'rel' in modes and (self.__missing or not byte_params[1]):
+        self.__modes()
+        if self.__long:
             return 'rel'
-        elif 'zrp' in modes and (self.__missing or not byte_params[1]):
-            return 'zrp'
-        elif 'abs' in modes and byte_params[1]:
-            return 'abs'
+        size = MISSING if self.__missing else len(self.__operand())
+        return SELECT[self.__instr][self.__shape * SIZES + size]
 
-        return None
+    def __opcode(self):
+        """
+        :return: The Line's opcode byte, or None if the mode isn't supported
+        """
+        if self.__long:
+            return OPCODES[(OPPOSITE[self.__instr], 'rel')]
+        mode = self.__mode()
+        if self.__modes() & REL and len(self.__operand()) == 2:
+            mode = 'rel'
+        return OPCODES.get((self.__instr, mode))
+
+    def __error(self):
+        if self.__long:
+            return '' if self.__target is not None or self.__missing else 'bop'
+        if self.__modes() & REL and len(self.__operand()) == 2:
+            return 'bbr'
+        if self.__opcode() is None:
+            return 'bam'
+        return ''
+
+    def encode(self):
+        """
+        Computes the Line's mode, opcode, operand bytes, length, checksum,
+        and error once and freezes them. Must be called after
+        replace_symbols, since the encoding can't change afterwards.
+
+        :return: The frozen Encoding
+        """
+        if self.__encoding is None:
+            error = self.__error()
+            self.__encoding = Encoding(self.__mode(), self.__opcode(), self.__operand(), error)
+        return self.__encoding
+
+    def fail(self, code):
+        """
+        Freezes the Line with the given error instead of an encoding,
+        for when the Parser keeps going past an error that would
+        otherwise be fatal. The Line then takes up no memory.
+
+        :param code: The error abbreviation
+        """
+        self.__encoding = Encoding(None, None, b'', code)
+
+    def encoding(self):
+        """
+        :return: The frozen Encoding, or None if the Line hasn't been encoded yet
+        """
+        return self.__encoding
+
+    def byte_params(self):
+        """
+        Converts the parameters into byte code. If there is a
+        Bad Branch error, then dummy bytes are returned.
+
+        If the instruction isn't in the opcode table, a BadOpcode
+        error is raised. If the parameters can't be converted to
+        hex, a BadOperand error is raised.
+
+        :return: The parameters in byte code form
+        """
+        operand = self.__operand() if self.__encoding is None else self.__encoding.operand
+        byte_params = [f"{b:02X}" for b in operand]
+        while len(byte_params) < 2:
+            byte_params.append('')
+        return byte_params
+
+    def mode(self):
+        """
+        :return: The addressing mode
+        """
+        if self.__encoding is None:
+            return self.__mode()
+        return self.__encoding.mode
 
     def __len__(self):
-        i = 1
-        if self.error():
+        if self.__encoding is not None:
+            return self.__encoding.length
+        if self.__error():
             return 0
-        for b in self.byte_params():
-            if b:
-                i += 1
+        return 1 + len(self.__operand())
 
-        return i
+    def code(self):
+        """
+        :return: The opcode and operand bytes, empty if there is an error
+        """
+        encoding = self.encode()
+        if encoding.error:
+            return b''
+        return bytes((encoding.opcode,)) + encoding.operand
 
     def assembly(self):
+        if self.__long:
+            # The branch and the JMP are written as two records
+            byte_params = self.byte_params()
+            return "{0:X}: {1:2} {2[0]:2}   \n{3:X}: {2[1]:2} {2[2]:2} {2[3]:2}".format(
+                self.addr(), self.opcode(), byte_params, self.addr() + 2
+            )
         return "{0}: {1:2} {2[0]:2} {2[1]:2}".format(
             hex(self.addr()).removeprefix("0x").upper(),
             self.opcode(),
@@ -410,61 +585,166 @@ class Opcode(Memory):
     def __str__(self):
         """
         Formats the Line's assembly and raw string into a console ready
-        format. Also checks for Bad branch, Bad address mode, and BadOperand
-        errors.
+        format. If there is an error, such as Bad branch or Bad address
+        mode, its message is shown instead of the assembly.
 
         :return: The Line's info in a console ready format.
         """
         error = self.error()
-        if error == 'bbr':
-            opc = ''
-            return "Bad branch in line: {0}\n{1:<15}{0:>2} {2}".format(
-                self.num(), opc, self.raw()
-            )
-
-        if error == 'bam':
+        if error:
             opc = ''
-            return "Bad address mode in line: {0}\n{1:<15}{0:>2} {2}".format(
-                self.num(), opc, self.raw()
+            return "{0}\n{1:<15}{2:>2} {3}".format(
+                Diagnostic.message_for(error, self.num()), opc, self.num(), self.raw()
             )
 
-        opc = self.assembly()
-        return "{:<15}{:>2} {}".format(opc, self.num(), self.raw())
+        opc, _, jmp = self.assembly().partition('\n')
+        out = "{:<15}{:>2} {}".format(opc, self.num(), self.raw())
+        return out + jmp + '\n' if jmp else out
 
     def chk(self):
         """
         :return: The XOR checksum of the Line's bytes
         """
-        error = self.error()
-        if error:
-            return 0
-        chk = int(self.opcode(), 16)
-
-        for p in self.byte_params():
-            if p != '':
-                chk ^= int(p, 16)
-        return chk
+        return self.encode().chk
 
     def opcode(self):
         """
         :return: The Line's opcode
         """
-        mode = self.mode()
-        if 'rel' in self.__get_modes() and self.byte_params()[1]:
-            mode = 'rel'
-        return Opcode.TABLE.get(self.instr(), {}).get(mode, '')
+        opcode = self.__opcode() if self.__encoding is None else self.__encoding.opcode
+        return '' if opcode is None else f"{opcode:02X}"
 
     def error(self):
-        byte_params = self.byte_params()
-        if 'rel' in self.__get_modes() and byte_params[1]:
-            return 'bbr'
-        if self.opcode() == '':
-            return 'bam'
-        try:
-            if self.params():
-                int(byte_params[0], 16)
-        except ValueError:
-            print(f'Bad operand in line: {self.num()}')
-            raise BadOperand()
+        if self.__encoding is None:
+            return self.__error()
+        return self.__encoding.error
+
+
+MODES = ('imp', 'acc', 'imm', 'zrp', 'zpx', 'zpy', 'abs', 'abx', 'aby', 'ind', 'inx', 'iny', 'rel')
+"""Every addressing mode, in the order of their bits"""
+BITS = {mode: 1 << i for i, mode in enumerate(MODES)}
+"""The bit of each addressing mode"""
+REL = BITS['rel']
+OPPOSITE = {'BCC': 'BCS', 'BCS': 'BCC', 'BEQ': 'BNE', 'BNE': 'BEQ', 'BMI': 'BPL', 'BPL': 'BMI', 'BVC': 'BVS', 'BVS': 'BVC'}
+"""The branch taken in each branch's place"""
+
+SUPPORTED = {instr: sum(BITS[mode] for mode in modes) for instr, modes in Opcode.TABLE.items()}
+"""The bitmask of the addressing modes each instruction supports"""
+OPCODES = {(instr, mode): int(opcode, 16) for instr, modes in Opcode.TABLE.items() for mode, opcode in modes.items()}
+"""The opcode byte of each instruction and addressing mode"""
+CYCLES = {(instr, mode): cycles for instr, modes in Opcode.CYCLES.items() for mode, cycles in modes.items()}
+"""The cycles each instruction and addressing mode takes, before any penalty"""
+PAGE_PENALTY = frozenset(
+    (instr, mode) for instr in ('ADC', 'AND', 'CMP', 'EOR', 'LDA', 'LDX', 'LDY', 'ORA', 'SBC')
+    for mode in ('abx', 'aby', 'iny') if mode in Opcode.TABLE[instr]
+)
+"""The reads that take a cycle longer when the indexed address is on the next page"""
+DECODE = [None] * 256
+"""The instruction and addressing mode of each opcode byte, or None if it isn't used"""
+for (_instr, _mode), _opcode in OPCODES.items():
+    DECODE[_opcode] = (_instr, _mode)
+
+# The shape of the parameters is their first character, then their
+# ending. A shape is 0 for no parameters, otherwise 1 + head * TAILS + tail.
+HEADS = {'#': 0, '(': 1}
+OTHER_HEAD = 2
+TAILS_3 = {'),Y': 1, ',X)': 2}
+TAILS_2 = {',X': 3, ',Y': 4}
+TAILS = 5
+NUM_SHAPES = 1 + (OTHER_HEAD + 1) * TAILS
+
+# The operand is 0, 1, or 2 bytes, or MISSING if its symbols aren't
+# known yet
+MISSING = 3
+SIZES = 4
+
+
+def classify(params: str):
+    """
+    Classifies the syntax of the parameters: immediate, indirect,
+    indexed, or bare.
+
+    :param params: The parameters
+    :return: The shape, an index into the rows of SELECT
+    """
+    if not params:
+        return 0
+    tail = TAILS_3.get(params[-3:]) or TAILS_2.get(params[-2:], 0)
+    return 1 + HEADS.get(params[0], OTHER_HEAD) * TAILS + tail
+
+
+def instr_params(statement):
+    """
+    Finds the parameters of an instruction. An instruction that only
+    has the implied mode takes no operand, so anything after it is a
+    comment. So is a word after an instruction that has the
+    accumulator mode if it can't be an operand, see comment_operand.
 
+    :param statement: A Statement returned by prepare
+    :return: The parameters, or '' if there are none
+    """
+    modes = SUPPORTED.get(statement.instr)
+    params = statement.operand
+    if not params or modes == BITS['imp']:
         return ''
+    if modes is not None and modes & BITS['acc']:
+        if comment_operand(statement):
+            return ''
+    return params
+
+
+def select(modes: int, shape: int, size: int):
+    """
+    Picks the addressing mode for an instruction. Only used to build
+    SELECT, so the order of the checks here is the order of priority.
+
+    :param modes: The bitmask of the instruction's addressing modes
+    :param shape: The shape of the parameters
+    :param size: The size of the operand, or MISSING
+    :return: The addressing mode, or None if none of them fit
+    """
+    def has(mode):
+        return modes & BITS[mode]
+
+    head, tail = divmod(shape - 1, TAILS) if shape else (None, None)
+    missing = size == MISSING
+    word = not has('rel') if missing else size == 2
+    short = missing or not word
+
+    if not shape and has('imp'):
+        return 'imp'
+    if not shape and has('acc'):
+        return 'acc'
+    if head == HEADS['#'] and has('imm'):
+        return 'imm'
+    if head == HEADS['(']:
+        if has('iny') and tail == TAILS_3['),Y']:
+            return 'iny'
+        if has('inx') and tail == TAILS_3[',X)']:
+            return 'inx'
+        if has('ind'):
+            return 'ind'
+    elif tail == TAILS_2[',X']:
+        if has('zpx') and short:
+            return 'zpx'
+        if has('abx') and word:
+            return 'abx'
+    elif tail in (TAILS_2[',Y'], TAILS_3['),Y']):
+        if has('zpy') and short:
+            return 'zpy'
+        if has('aby') and word:
+            return 'aby'
+    elif has('rel') and short:
+        return 'rel'
+    elif has('zrp') and short:
+        return 'zrp'
+    elif has('abs') and word:
+        return 'abs'
+    return None
+
+
+SELECT = {
+    instr: tuple(select(modes, shape, size) for shape in range(NUM_SHAPES) for size in range(SIZES))
+    for instr, modes in SUPPORTED.items()
+}
+"""The addressing mode of each instruction for every shape and operand size"""
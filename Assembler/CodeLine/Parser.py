@@ -1,10 +1,16 @@
-from operator import itemgetter
+import sys
+from collections import ChainMap
 
 from .Opcode import Opcode
 from .Checksum import Checksum
 from .NOpcode import NOpcode
 from .Memory import Memory
-from .Op_Param import op_params
+from .Listing import footer
+from .Diagnostic import Diagnostic
+from .Image import Image
+from .Stats import DISABLED, CountedLookups
+from .Writers import TEXT, FORMATS, write
+from .Source import *
 from .Exceptions import *
 
 
@@ -15,58 +21,274 @@ class Parser:
     Writes assembled code to the console and
     output file.
     """
-    def __init__(self, str_lines: list):
+    MAX_PASSES = 16
+    """The number of layouts relaxation tries before giving up on shrinking"""
+
+    def __init__(self, str_lines: list, interactive: bool = True, stats=DISABLED, base=None,
+                 relax: bool = False, long_branches: bool = False):
         """
-        Converts the source code into Lines. Also sorts said
+        Converts the source code into Lines. Each ORG starts a new
+        segment at its address, and any code before the first ORG
+        starts at $8000. Also sorts said
         Lines into lists, so they can be operated on later without
-        further sorting. After the symbol table has been calculated,
-        goes back into the Lines and replaces any symbol with the
-        corresponding value.
+        further sorting. Any Line that refers to a symbol that isn't
+        defined yet is recorded in the fixup list. After the symbol
+        table has been calculated, the fixups are patched in a single
+        pass and each Line's encoding is frozen. Finally, a running XOR
+        over the emitted bytes gives every checksum its value, and the
+        bytes are placed in the memory Image.
+
+        Every problem found is recorded as a Diagnostic. When
+        interactive, errors are printed as they are found, duplicate
+        symbols wait for the user, and any other error is fatal.
+        Otherwise, nothing is printed, and the Parser keeps going
+        past any error on a single line by leaving that line out of
+        the object code.
+
+        Each of these phases is timed by the given Stats, along with
+        counts of the lines, symbols, and bytes.
+
+        Symbols are looked up in the program's own symbol table, then
+        in the base table, whose symbols may not be defined again.
+
+        A forward reference is given room for a two byte operand, since
+        its value isn't known yet. When relaxing, the layout is redone
+        with the sizes the forward references actually need until it
+        stops changing, so a reference that turns out to be in zero
+        page takes the zero page mode. With long branches, a branch
+        that can't reach its target becomes the opposite branch over a
+        JMP to it instead of an error.
 
         :param str_lines: A list of lines taken from the source code.
+        :param interactive: False to collect every error without stopping
+        :param stats: The Stats to record into
+        :param base: A read-only symbol table under the program's own, such as a SymbolDatabase, or None
+        :param relax: True to size forward references by their values
+        :param long_branches: True to turn branches that are out of range into a branch and a JMP
         """
         self.__lines = []
         self.__memory = []
         self.__opcode = []
-        self.__errors = []
+        self.__diagnostics = []
+        self.__fixups = []
+        self.__image = Image()
         self.__symbols = {}
-        self.__start = int('8000', 16)
+        # Every symbol an operand can refer to
+        self.__scope = self.__symbols if base is None else ChainMap(self.__symbols, base)
+        if stats.enabled():
+            self.__scope = CountedLookups(self.__scope, stats, 'symbol lookups')
+        self.__interactive = interactive
+        self.__stats = stats
+        # The size each forward reference is laid out with, and the
+        # line numbers of the branches to lengthen
+        self.__sizes = {}
+        self.__long = set()
+        # True while laying out the passes that relaxing throws away,
+        # so each line is only counted once
+        self.__relaxing = False
 
-        for line in str_lines:
-            if 'ORG' in line[9:13]:
-                num = line.split()[1]
-                self.__start = int(num.removeprefix('$'), 16)
+        if relax or long_branches:
+            str_lines = list(str_lines)
+            with stats.phase('relax'):
+                self.__relax(str_lines, relax, long_branches)
+        with stats.phase('first pass'):
+            self.__first_pass(str_lines)
 
-        curr = self.__start
-        for i, line in enumerate(str_lines, 1):
-            if len(line) > 64:
-                raise ValueError()
-            line = line.removesuffix('\n')
-            line = f"{line:<63}\n"
-            up_line = line.replace(line[:14], line[:14].upper())
-            if up_line.startswith("*") or up_line.strip().startswith(';') or 'END' in up_line[9:13] or 'ORG' in up_line[9:13]:
-                new_l = NOpcode(up_line, i)
-                self.__lines.append(new_l)
-            elif 'EQU' in up_line[9:13]:
-                self.__store_equ(up_line, i, curr)
-                new_l = NOpcode(up_line, i)
-                self.__lines.append(new_l)
-            elif 'CHK' in up_line[9:13]:
-                new_l = Checksum(up_line, curr, self.__memory.copy(), i)
-                self.__add_memory(new_l, i)
-                curr += len(new_l)
-            else:
-                new_l = Opcode(up_line, curr, self.__symbols, i)
-                self.__opcode.append(new_l)
-                self.__add_memory(new_l, i)
-                curr += len(new_l)
+        with stats.phase('fixups'):
+            for line in self.__fixups:
+                line.replace_symbols(self.__scope)
+        with stats.phase('encode'):
+            for line in self.__opcode:
+                try:
+                    line.encode()
+                except CustomException as e:
+                    self.__fail(e, line.num())
+                    line.fail(e.code)
 
-            if curr > int("FFFF", 16) or len(self.__symbols) > 255:
-                print("Memory Full")
-                raise MemoryFull()
+        with stats.phase('checksums and image'):
+            running = 0
+            marks = {}
+            for line in self.__memory:
+                if line.symbol():
+                    marks.setdefault(line.symbol(), running)
+                if isinstance(line, Checksum):
+                    try:
+                        line.compute(running, marks)
+                    except CustomException as e:
+                        self.__fail(e, line.num())
+                        line.fail(e.code)
+                running ^= line.chk()
+                try:
+                    self.__image.write(line.addr(), line.code(), line.num())
+                except CustomException as e:
+                    self.__fail(e, line.num())
+                    line.fail(e.code)
 
         for line in self.__opcode:
-            line.replace_symbols(self.__symbols)
+            if line.error() in ('bbr', 'bam'):
+                self.__diagnostics.append(Diagnostic(line.num(), line.error()))
+        self.__diagnostics.sort(key=lambda d: d.line)
+
+        if stats.enabled():
+            stats.count('symbols', len(self.__symbols))
+            stats.count('forward references', len(self.__fixups))
+            stats.count('expression evaluations', sum(line.evaluations() for line in self.__opcode))
+            stats.count('bytes emitted', len(self.__image))
+            stats.count('errors', len(self.__diagnostics))
+
+    def __first_pass(self, str_lines):
+        """
+        A helper function that converts every line of source code into
+        a Line and lays them out, starting over from an empty symbol
+        table.
+
+        :param str_lines: The lines taken from the source code
+        """
+        self.__lines = []
+        self.__memory = []
+        self.__opcode = []
+        self.__diagnostics = []
+        self.__fixups = []
+        self.__symbols.clear()
+
+        curr = START
+        for i, line in enumerate(str_lines, 1):
+            try:
+                curr = self.__add_line(line, i, curr)
+                if curr > Image.SIZE:
+                    raise MemoryFull(f"Memory full in line: {i}")
+            except MemoryFull as e:
+                self.__fail(e, i)
+                break
+            except (CustomException, ValueError) as e:
+                self.__fail(e, i)
+                self.__lines.append(NOpcode(line, i, Diagnostic.from_exception(e, i).code))
+                if not self.__relaxing:
+                    self.__stats.count('lines: failed')
+
+    def __relax(self, str_lines: list, relax: bool, long_branches: bool):
+        """
+        A helper function that finds the size of every forward
+        reference and which branches to lengthen, by laying the program
+        out again until nothing changes. Each layout starts from the
+        sizes the last one turned out to need. A reference that has to
+        grow again, or a branch that has been lengthened, keeps its
+        larger size from then on, so the layouts always settle. If they
+        don't within MAX_PASSES, every forward reference keeps the
+        two byte operand.
+
+        :param str_lines: The lines taken from the source code
+        :param relax: True to size forward references by their values
+        :param long_branches: True to lengthen branches that are out of range
+        """
+        interactive = self.__interactive
+        self.__interactive = False
+        self.__relaxing = True
+        grown = set()
+        try:
+            for _ in range(Parser.MAX_PASSES):
+                self.__first_pass(str_lines)
+                sizes = {}
+                long = set(self.__long)
+                fixups = set(self.__fixups)
+                for line in fixups:
+                    line.replace_symbols(self.__scope)
+                if self.__stats.enabled():
+                    self.__stats.count('expression evaluations', sum(line.evaluations() for line in self.__opcode))
+                for line in self.__opcode:
+                    try:
+                        error = line.error()
+                        size = len(line)
+                    except CustomException:
+                        continue
+                    if long_branches and error == 'bbr':
+                        long.add(line.num())
+                    elif relax and line in fixups and size:
+                        sizes[line.num()] = size
+                for num, size in sizes.items():
+                    old = self.__sizes.get(num)
+                    if num in grown or old is not None and size > old:
+                        grown.add(num)
+                        sizes[num] = max(size, old or 0)
+                if sizes == self.__sizes and long == self.__long:
+                    return
+                self.__sizes = sizes
+                self.__long = long
+            self.__sizes = {}
+        finally:
+            self.__interactive = interactive
+            self.__relaxing = False
+
+    def __add_line(self, line: str, num: int, curr: int):
+        """
+        A helper function that converts a single line of source code
+        into a Line and files it away.
+
+        :param line: A line taken from the source code
+        :param num: The current line number
+        :param curr: The current memory address
+        :return: The memory address after the Line
+        """
+        up_line = prepare(line)
+        line_kind = kind(up_line)
+        if not self.__relaxing:
+            self.__stats.count('lines: ' + line_kind)
+        if line_kind == NOPCODE:
+            new_l = NOpcode(up_line, num)
+            self.__lines.append(new_l)
+        elif line_kind == ORIGIN:
+            curr = origin(up_line)
+            new_l = NOpcode(up_line, num)
+            self.__lines.append(new_l)
+        elif line_kind == INCLUDE:
+            raise BadInclude(f"Bad include in line: {num}")
+        elif line_kind == EQU:
+            self.__store_equ(up_line, num, curr)
+            new_l = NOpcode(up_line, num)
+            self.__lines.append(new_l)
+        elif line_kind == CHECKSUM:
+            new_l = Checksum(up_line, curr, num)
+            self.__add_memory(new_l, num)
+            curr += len(new_l)
+        else:
+            new_l = Opcode(up_line, curr, self.__scope, num)
+            if num in self.__long:
+                new_l.lengthen()
+            size = len(new_l)
+            self.__opcode.append(new_l)
+            if new_l.missing():
+                size = self.__sizes.get(num, size)
+                self.__fixups.append(new_l)
+            self.__add_memory(new_l, num)
+            curr += size
+        return curr
+
+    def __fail(self, e: Exception, num: int):
+        """
+        A helper function that records an error that would otherwise
+        be fatal. When interactive, the error is printed and re-raised.
+
+        :param e: The exception raised for the line
+        :param num: The line number
+        """
+        diagnostic = Diagnostic.from_exception(e, num)
+        self.__diagnostics.append(diagnostic)
+        if self.__interactive:
+            print(diagnostic.message)
+            raise e
+
+    def __duplicate(self, num: int):
+        """
+        A helper function that records a duplicate symbol. When
+        interactive, the error is printed and waits for the user.
+
+        :param num: The line number
+        """
+        diagnostic = Diagnostic(num, 'dup')
+        self.__diagnostics.append(diagnostic)
+        if self.__interactive:
+            print(diagnostic.message)
+            input('Press enter to continue...')
 
     def __add_memory(self, line: Memory, num):
         """
@@ -84,119 +306,145 @@ class Parser:
         self.__lines.append(line)
         self.__memory.append(line)
         if line.symbol():
-            if line.symbol() not in self.__symbols.keys():
-                self.__symbols[line.symbol()] = hex(line.addr()).removeprefix('0x').upper()
+            if line.symbol() not in self.__scope:
+                self.__symbols[line.symbol()] = line.addr()
             else:
-                error = f"Duplicate symbol in line: {num}"
-                self.__errors.append(error)
-                print(error)
-                input('Press enter to continue...')
+                self.__duplicate(num)
 
-    def __store_equ(self, line: str, line_num: int, addr: int):
+    def __store_equ(self, line: Statement, line_num: int, addr: int):
         """
         Parses a string containing the EQU instruction and stores
-        their symbol in the symbol table. Also checks for duplicate
-        symbols.
+        their symbol in the symbol table. The value may refer to
+        symbols that are already defined and to the current address
+        with "*". Also checks for duplicate symbols.
 
-        :param line: An unparsed EQU string
+        :param line: A Statement containing the EQU instruction
         :param line_num: The current line number
         :param addr: The current memory address
         """
-        symbol, _, val, *_ = line.split()
-        if symbol not in self.__symbols.keys():
-            val.replace("*", hex(addr).removeprefix('0x').upper())
+        symbol = line.label
+        if symbol not in self.__scope:
+            self.__stats.count('expression evaluations')
             try:
-                val = op_params(val)
+                symbol, val = equ(line, self.__scope, addr)
             except ValueError as e:
-                print(f"Bad operand in line: {line_num}")
-                raise BadOperand(e)
+                raise BadOperand(f"Bad operand in line: {line_num}") from e
 
             self.__symbols[symbol] = val
         else:
-            error = f"Duplicate symbol in line: {line_num}"
-            self.__errors.append(error)
-            print(error)
-            input('Press enter to continue...')
+            self.__duplicate(line_num)
 
-    def print(self):
+    def diagnostics(self):
+        """
+        :return: Every problem found, in line order
+        """
+        return self.__diagnostics
+
+    def symbols(self):
+        """
+        :return: The symbol table, without the base symbols
+        """
+        return self.__symbols
+
+    def lines(self):
+        """
+        :return: Every Line in source order
+        """
+        return self.__lines
+
+    def print(self, out=None):
         """
         Prints the parsed code and any non-fatal errors to the
-        console.
+        console, or to the given text stream. The listing is written
+        in as few writes as possible: all at once, or when interactive,
+        in one piece up to each error before waiting for the user.
+
+        :param out: A text stream, or None for the console
         """
-        print('Assembling')
-        num_bytes = 0
-        num_errors = len(self.__errors)
-        for i, line in enumerate(self.__lines):
-            try:
-                print(str(line).format(i + 1), end="")
+        out = sys.stdout if out is None else out
+        with self.__stats.phase('listing'):
+            if not self.__interactive:
+                out.writelines(self.listing())
+                return
+            pending = ['Assembling\n']
+            for line in self.__lines:
+                pending.append(str(line))
                 if line.error() != '':
+                    out.writelines(pending)
+                    out.flush()
+                    pending.clear()
                     input('Press enter to continue...')
-                num_bytes += len(line)
-                if line.error() != '':
-                    num_errors += 1
-            except ValueError as e:
-                print(f"Bad operand in line: {i + 1}")
-                raise e
-
-        print(f"\n--End assembly, {num_bytes} bytes, errors: {num_errors}\n")
-
-        alpha = []
-        num = []
-        for k, v in self.__symbols.items():
-            while len(v) < 2:
-                v = f"0{v}"
-            alpha.append((k, v))
-            num.append((k, v))
-        alpha.sort(key=itemgetter(0))
-        num.sort(key=lambda tup: int(tup[1].removeprefix('$'), 16))
-
-        def print_symbol(k, v):
-            nonlocal curr_line, i
-            curr_line += "{:<9}{:<9}".format(k, f"=${v}")
-            i += 1
-            if i % 4 == 0:
-                print(curr_line)
-                curr_line = '    '
-
-        print(f"Symbol table - alphabetical order:")
-        curr_line = '    '
-        i = 0
-        for k, v in alpha:
-            print_symbol(k, v)
-
-        print(curr_line)
-
-        print(f"Symbol table - numerical order:")
-        curr_line = '    '
-        i = 0
-        for k, v in num:
-            print_symbol(k, v)
-
-        print(curr_line, end="")
-
-    def write_to_file(self, filename):
+            pending.extend(footer(self.num_bytes(), len(self.__diagnostics), self.__symbols))
+            out.writelines(pending)
+
+    def image(self):
+        """
+        :return: The memory Image holding the machine code
+        """
+        return self.__image
+
+    def listing(self):
+        """
+        Generates the console listing in the same format as print,
+        without waiting on errors.
+
+        :return: A generator of strings
+        """
+        yield 'Assembling\n'
+        for line in self.__lines:
+            yield str(line)
+        yield from footer(self.num_bytes(), len(self.__diagnostics), self.__symbols)
+
+    def num_bytes(self):
+        """
+        :return: The number of bytes assembled
+        """
+        return sum(len(line) for line in self.__lines)
+
+    def object(self, fmt: str = TEXT):
+        """
+        Generates the contents of the object file without writing it,
+        in the same format as write_to_file.
+
+        :param fmt: TEXT, or one of the keys of Writers.FORMATS
+        :return: The contents as bytes, or None if there are errors
+        """
+        if len(self.__diagnostics):
+            return None
+        if fmt != TEXT:
+            backend, _ = FORMATS[fmt]
+            return backend(self.__image.segments())
+        return '\n'.join(m.assembly() for m in self.__memory).encode('ascii')
+
+    def write_to_file(self, filename, fmt: str = TEXT):
         """
         Writes the generated assembly to the given filename. The
-        assembly consists of memory address and byte codes like so::
+        text format consists of memory address and byte codes like so::
 
             MEM1: B1 B2 B3
             MEM2: B1 B2 B3
             MEM3: B1 B2 B3
             ...
 
-        If the file already exists, its contents are overwritten.
+        Any format in Writers.FORMATS is written straight from the
+        segments of the memory Image instead. If the file already exists, its contents are
+        overwritten.
 
         :param filename: Name of the file to write to
+        :param fmt: TEXT, or one of the keys of Writers.FORMATS
         """
         out_str = []
-        if len(self.__errors):
+        if len(self.__diagnostics):
             return
-        for m in self.__memory:
-            if m.error():
+        with self.__stats.phase('write'):
+            if fmt != TEXT:
+                write(filename, fmt, self.__image.segments())
                 return
-            out_str.append(m.assembly() + '\n')
-        out_str.append(out_str.pop().removesuffix('\n'))
+            for m in self.__memory:
+                out_str.append(m.assembly() + '\n')
+            if out_str:
+                out_str.append(out_str.pop().removesuffix('\n'))
 
-        out = open(filename, 'w')
-        out.writelines(out_str)
-        out.close()
+            out = open(filename, 'w')
+            out.writelines(out_str)
+            out.close()
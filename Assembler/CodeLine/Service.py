@@ -0,0 +1,272 @@
+import asyncio
+import base64
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter, time
+
+from .Parser import Parser
+from .Writers import TEXT, FORMATS
+
+
+def assemble_source(source: str, fmt: str = TEXT):
+    """
+    Assembles source text without touching the file system. Runs in
+    the Service's worker processes.
+
+    :param source: The source code
+    :param fmt: TEXT, or one of the keys of Writers.FORMATS
+    :return: A JSON ready dict with the object file, listing, symbols,
+             byte count, diagnostics, and the time taken
+    """
+    start = perf_counter()
+    parser = Parser(source.splitlines(keepends=True), False)
+    obj = parser.object(fmt)
+    if obj is None:
+        encoding = None
+    elif fmt == 'bin':
+        encoding, obj = 'base64', base64.b64encode(obj).decode('ascii')
+    else:
+        encoding, obj = 'text', obj.decode('ascii')
+    return {
+        'ok': obj is not None,
+        'format': fmt,
+        'object': obj,
+        'encoding': encoding,
+        'listing': ''.join(parser.listing()),
+        'symbols': parser.symbols(),
+        'bytes': parser.num_bytes(),
+        'diagnostics': [d.to_dict() for d in parser.diagnostics()],
+        'assemble_time': perf_counter() - start,
+    }
+
+
+def _started(source: str, fmt: str = TEXT):
+    """
+    Runs assemble_source in a worker process, noting when it started.
+
+    :param source: The source code
+    :param fmt: TEXT, or one of the keys of Writers.FORMATS
+    :return: The wall clock time the worker started at, and the result
+    """
+    started = time()
+    return started, assemble_source(source, fmt)
+
+
+class RequestError(Exception):
+    """
+    When raised, signifies that a request to the Service is malformed.
+    Carries the HTTP status to answer with.
+    """
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class Service:
+    """
+    A long-running assembly service. Takes source text over a Unix
+    socket or localhost HTTP and assembles it on a pool of worker
+    processes, so callers don't pay for process startup and imports on
+    every assembly. The number of assemblies in flight is limited, and
+    each response reports how long the request waited and took. An
+    assembly that times out is answered straight away, but keeps its
+    slot until its worker is done with it, so the limit holds for the
+    work actually running.
+
+    On a Unix socket, each request is one line of JSON and gets one
+    line of JSON back. Over HTTP, POST /assemble takes either JSON or
+    the raw source text, and GET /health reports the service state.
+    A JSON request has a "source" field and an optional "format".
+    """
+    READ_LIMIT = 16 << 20
+
+    def __init__(self, jobs: int = None, max_requests: int = 16, timeout: float = 30):
+        """
+        :param jobs: The number of worker processes, or None for one per core
+        :param max_requests: The number of assemblies that may run at once
+        :param timeout: The number of seconds an assembly may take
+        """
+        self.__jobs = jobs
+        self.__max_requests = max_requests
+        self.__timeout = timeout
+        self.__pool = None
+        self.__slots = None
+        self.__served = 0
+        self.__active = 0
+
+    async def assemble(self, request: dict):
+        """
+        Assembles a single request on the worker pool, waiting for a
+        free slot first. The queue time runs until a worker starts on
+        the request.
+
+        :param request: A dict with the source and an optional format
+        :return: The result of assemble_source, with the queue and total times
+        """
+        source = request.get('source')
+        fmt = request.get('format', TEXT)
+        if not isinstance(source, str):
+            raise RequestError('"source" must be a string')
+        if fmt != TEXT and fmt not in FORMATS:
+            raise RequestError(f'"format" must be one of {", ".join([TEXT, *FORMATS])}')
+
+        start = perf_counter()
+        submitted = time()
+        await self.__slots.acquire()
+        self.__active += 1
+        try:
+            work = self.__pool.submit(_started, source, fmt)
+        except BaseException:
+            self.__release()
+            raise
+        # The slot is given back once the worker is done, not when the request gives up on it
+        loop = asyncio.get_running_loop()
+        work.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self.__release))
+        try:
+            started, result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(work)), self.__timeout)
+        except asyncio.TimeoutError:
+            raise RequestError(f"Assembly took longer than {self.__timeout} s", 504)
+        self.__served += 1
+        result['queue_time'] = max(started - submitted, 0)
+        result['time'] = perf_counter() - start
+        return result
+
+    def __release(self):
+        """
+        A helper function that frees the slot of an assembly once its
+        worker is done.
+        """
+        self.__active -= 1
+        self.__slots.release()
+
+    def health(self):
+        """
+        :return: A JSON ready dict describing the service state
+        """
+        return {'ok': True, 'served': self.__served, 'active': self.__active,
+                'max_requests': self.__max_requests, 'pid': os.getpid()}
+
+    async def __respond(self, body: bytes):
+        """
+        A helper function that turns a JSON request body into a
+        response, converting any problem into an error response.
+
+        :param body: The request body
+        :return: The HTTP status and the response as a dict
+        """
+        try:
+            try:
+                request = json.loads(body)
+            except (ValueError, UnicodeDecodeError) as e:
+                raise RequestError(f"Bad JSON: {e}")
+            if not isinstance(request, dict):
+                raise RequestError('The request must be a JSON object')
+            return 200, await self.assemble(request)
+        except RequestError as e:
+            return e.status, {'ok': False, 'error': str(e)}
+
+    async def handle_unix(self, reader, writer):
+        """
+        Answers newline delimited JSON requests until the client
+        disconnects.
+
+        :param reader: The client's StreamReader
+        :param writer: The client's StreamWriter
+        """
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                _, response = await self.__respond(line)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http(self, reader, writer):
+        """
+        Answers HTTP/1.1 requests, keeping the connection alive unless
+        the client asks otherwise.
+
+        :param reader: The client's StreamReader
+        :param writer: The client's StreamWriter
+        """
+        try:
+            while request_line := await reader.readline():
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while (header := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if method == 'GET' and path == '/health':
+                    status, response = 200, self.health()
+                elif method == 'POST' and path == '/assemble':
+                    if headers.get('content-type', '').startswith('text/plain'):
+                        body = json.dumps({'source': body.decode('utf-8', 'replace')})
+                    status, response = await self.__respond(body)
+                else:
+                    status, response = 404, {'ok': False, 'error': f"No route for {method} {path}"}
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(response).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address: str, ready=None):
+        """
+        Serves requests until cancelled.
+
+        :param address: "unix:PATH" for a Unix socket, otherwise "[HOST:]PORT"
+                        for HTTP, where HOST defaults to 127.0.0.1
+        :param ready: Called with the address once the server is listening
+        """
+        self.__slots = asyncio.Semaphore(self.__max_requests)
+        self.__pool = ProcessPoolExecutor(max_workers=self.__jobs)
+        try:
+            if address.startswith('unix:'):
+                path = address.removeprefix('unix:')
+                if os.path.exists(path):
+                    os.remove(path)
+                server = await asyncio.start_unix_server(self.handle_unix, path, limit=Service.READ_LIMIT)
+            else:
+                host, _, port = address.rpartition(':')
+                server = await asyncio.start_server(
+                    self.handle_http, host or '127.0.0.1', int(port), limit=Service.READ_LIMIT
+                )
+            if ready is not None:
+                ready(address)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.__pool.shutdown(cancel_futures=True)
+
+    def run(self, address: str, ready=None):
+        """
+        Serves requests until interrupted. See serve.
+
+        :param address: "unix:PATH" or "[HOST:]PORT"
+        :param ready: Called with the address once the server is listening
+        """
+        try:
+            asyncio.run(self.serve(address, ready))
+        except KeyboardInterrupt:
+            pass
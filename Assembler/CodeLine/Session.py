@@ -0,0 +1,534 @@
+import heapq
+from collections import ChainMap
+
+from .Opcode import Opcode
+from .Checksum import Checksum
+from .NOpcode import NOpcode
+from .Memory import Memory
+from .Image import Image
+from .Listing import footer
+from .Diagnostic import Diagnostic
+from .Writers import TEXT, write
+from .Source import *
+from .Exceptions import *
+
+
+class _Record:
+    """
+    What a Session remembers about a single line of source code.
+    """
+    __slots__ = ('index', 'text', 'up', 'kind', 'line', 'addr', 'size', 'defines', 'uses',
+                 'codes', 'encode_code', 'check_code', 'place_code', 'running')
+
+    def __init__(self, index: int, text: str):
+        self.index = index
+        self.text = text
+        self.up = None
+        self.kind = NOPCODE
+        self.line = None
+        self.addr = None
+        self.size = 0
+        self.defines = ''
+        self.uses = ()
+        self.codes = []
+        self.encode_code = ''
+        self.check_code = ''
+        self.place_code = ''
+        self.running = 0
+
+
+class _Before:
+    """
+    The symbol table as a Parser would see it at a given line: only
+    the symbols defined above that line, and the base symbols.
+    """
+    __slots__ = ('symbols', 'definer', 'index', 'base')
+
+    def __init__(self, symbols: dict, definer: dict, index: int, base=None):
+        self.symbols = symbols
+        self.definer = definer
+        self.index = index
+        self.base = base
+
+    def __contains__(self, name):
+        record = self.definer.get(name)
+        if record is not None and record.index < self.index:
+            return True
+        return self.base is not None and name in self.base
+
+    def __getitem__(self, name):
+        record = self.definer.get(name)
+        if record is not None and record.index < self.index:
+            return self.symbols[name]
+        if self.base is None:
+            raise KeyError(name)
+        return self.base[name]
+
+
+class Session:
+    """
+    An incremental assembler for editors. Keeps every Line from the
+    last assembly along with the address layout and a graph of which
+    lines define and use which symbols. After an edit, only the edited
+    lines, the lines whose address moved, and the lines that use a
+    symbol whose value changed are assembled again. The result always
+    matches a fresh non-interactive Parser run on the same source.
+    """
+    def __init__(self, str_lines: list, base=None):
+        """
+        :param str_lines: A list of lines taken from the source code.
+        :param base: A read-only symbol table under the program's own, such as a SymbolDatabase, or None
+        """
+        self.__records = []
+        self.__symbols = {}
+        self.__base = base
+        # The Record whose line defines each symbol
+        self.__definer = {}
+        # The Records whose lines use, or try to define, each symbol
+        self.__users = {}
+        self.__attempts = {}
+        self.__checksums = set()
+        # The first Memory Record with each label, and whether every
+        # Record's running XOR is up to date
+        self.__marks = {}
+        self.__walked = False
+        # The ORG Records, which split the program into segments
+        self.__origins = []
+        self.__last = None
+        self.__rebuild(list(str_lines))
+
+    def __rebuild(self, str_lines: list):
+        """
+        A helper function that assembles every line from scratch,
+        stopping where the Parser would once memory is full.
+
+        :param str_lines: A list of lines taken from the source code.
+        """
+        self.__records = [_Record(i, text) for i, text in enumerate(str_lines)]
+        self.__symbols = {}
+        self.__definer = {}
+        self.__users = {}
+        self.__attempts = {}
+        self.__checksums = set()
+        self.__marks = {}
+        self.__walked = False
+        self.__last = None
+
+        curr = START
+        for record in self.__records:
+            self.__process(record, curr)
+            curr = record.addr + record.size
+            failed = isinstance(record.line, NOpcode) and record.line.error()
+            if not failed and curr > Image.SIZE:
+                record.codes.append('mem')
+                self.__last = record.index
+                break
+        self.__finish(self.__records[:self.__end()])
+
+        # Like the Parser's Image, the line that ran out of memory can't be placed
+        if self.__last is not None:
+            record = self.__records[self.__last]
+            code = record.line.code() if isinstance(record.line, Memory) else b''
+            if code and record.addr + len(code) > Image.SIZE:
+                record.place_code = 'mem'
+                record.line.fail('mem')
+
+        self.__origins = [r for r in self.__records[:self.__end()] if r.kind == ORIGIN]
+        if self.__overlapping():
+            self.__place()
+
+    def __spans(self):
+        """
+        A helper function that finds the address range of each segment
+        of the program. Addresses only grow within a segment, so each
+        one spans from its first address to the end of its last line.
+
+        :return: The [start, end) range of each segment, in line order
+        """
+        end = self.__end()
+        bounds = [0] + [r.index for r in self.__origins if r.index < end] + [end]
+        spans = []
+        for first, stop in zip(bounds, bounds[1:]):
+            if first < stop:
+                last = self.__records[stop - 1]
+                spans.append((self.__records[first].addr, last.addr + last.size))
+        return spans
+
+    def __overlapping(self):
+        """
+        :return: True if any two segments of the program share an address
+        """
+        spans = sorted((start, stop) for start, stop in self.__spans() if start < stop)
+        return any(prev[1] > span[0] for prev, span in zip(spans, spans[1:]))
+
+    def __place(self):
+        """
+        A helper function that places every line in a memory Image,
+        the same way the Parser does, to find the lines that overlap
+        another segment.
+        """
+        image = Image()
+        for record in self.__records[:self.__end()]:
+            line = record.line
+            if not isinstance(line, Memory) or record.place_code:
+                continue
+            try:
+                image.write(line.addr(), line.code(), line.num())
+            except CustomException as e:
+                record.place_code = e.code
+                line.fail(e.code)
+
+    def edit(self, num: int, new_lines: list, count: int = 1):
+        """
+        Replaces lines of source code and reassembles what the change
+        affects. Adding or changing an ORG line, running out of
+        memory, or overlapping segments fall back to assembling
+        everything.
+
+        :param num: The line number of the first line to replace
+        :param new_lines: The new lines, which may be empty to delete lines
+        :param count: The number of lines to replace, 0 to insert
+        :return: The line numbers that were assembled again
+        """
+        first = num - 1
+        old = self.__records[first:first + count]
+        if self.__last is not None or any(r.kind == ORIGIN for r in old) or self.__overlapping() \
+                or any(kind(prepare(line)) == ORIGIN for line in new_lines):
+            texts = [r.text for r in self.__records]
+            texts[first:first + count] = new_lines
+            self.__rebuild(texts)
+            return list(range(1, self.__end() + 1))
+
+        changed = set()
+        for record in old:
+            if self.__definer.get(record.defines) is record:
+                changed.add(record.defines)
+            self.__unlink(record)
+            record.index = -1
+        new = [_Record(first + i, text) for i, text in enumerate(new_lines)]
+        self.__records[first:first + count] = new
+        if len(new) != len(old):
+            for record in self.__records[first + len(new):]:
+                record.index += len(new) - len(old)
+                record.line.renumber(record.index + 1)
+
+        heap = list(range(first, min(first + max(len(new), 1), len(self.__records))))
+        late = set()
+        for symbol in changed:
+            self.__notify(symbol, first, heap, late)
+        done = self.__relayout(heap, late)
+
+        if any(stop > Image.SIZE for _, stop in self.__spans()) or self.__overlapping():
+            self.__rebuild([r.text for r in self.__records])
+            return list(range(1, self.__end() + 1))
+        return sorted(r.index + 1 for r in done)
+
+    def __relayout(self, heap: list, late: set):
+        """
+        A helper function that assembles the given lines again in
+        address order. A line whose end address moved pulls in the
+        next line. A symbol whose value changed pulls in the lines
+        below that use it, while the lines above that use it are only
+        encoded again, since their length can't depend on it.
+
+        :param heap: A heap of Record indices to assemble again
+        :param late: Records above the edit to encode again
+        :return: The Records that were assembled again
+        """
+        heapq.heapify(heap)
+        done = set()
+        while heap or late:
+            while heap:
+                i = heapq.heappop(heap)
+                record = self.__records[i]
+                if record in done:
+                    continue
+                done.add(record)
+                prev = self.__records[i - 1] if i else None
+                curr = prev.addr + prev.size if prev else START
+                for symbol in self.__process(record, curr):
+                    self.__notify(symbol, i + 1, heap, late)
+                end = record.addr + record.size
+                if i + 1 < len(self.__records) and self.__records[i + 1].addr != end:
+                    heapq.heappush(heap, i + 1)
+            for record in late - done:
+                done.add(record)
+                for symbol in self.__process(record, record.addr):
+                    self.__notify(symbol, record.index + 1, heap, late)
+            late -= done
+        self.__finish(done)
+        return done
+
+    def __notify(self, symbol: str, pos: int, heap: list, late: set):
+        """
+        A helper function that schedules the lines affected by a
+        symbol whose value or definition changed.
+
+        :param symbol: The symbol
+        :param pos: The index of the first Record that can be laid out again
+        :param heap: The heap of Record indices to assemble again
+        :param late: The Records to encode again
+        """
+        for record in self.__users.get(symbol, ()):
+            if record.index >= pos:
+                heapq.heappush(heap, record.index)
+            else:
+                late.add(record)
+        for record in self.__attempts.get(symbol, ()):
+            if record.index >= pos:
+                heapq.heappush(heap, record.index)
+
+    def __unlink(self, record: _Record):
+        """
+        A helper function that removes a Record from the symbol table
+        and the dependency graph.
+
+        :param record: The Record
+        """
+        for name in record.uses:
+            self.__users[name].discard(record)
+        if record.defines:
+            self.__attempts[record.defines].discard(record)
+            if self.__definer.get(record.defines) is record:
+                del self.__definer[record.defines]
+                del self.__symbols[record.defines]
+        self.__checksums.discard(record)
+        record.uses = ()
+        record.defines = ''
+
+    def __process(self, record: _Record, curr: int):
+        """
+        A helper function that converts a single line of source code
+        into a Line, the same way the Parser does, and links it into
+        the dependency graph. Opcodes are encoded later by __finish.
+
+        :param record: The Record of the line
+        :param curr: The memory address of the line
+        :return: The symbols whose value or definition changed
+        """
+        old_symbol = record.defines if self.__definer.get(record.defines) is record else ''
+        old_value = self.__symbols.get(old_symbol)
+        self.__unlink(record)
+        record.addr = curr
+        record.size = 0
+        record.codes = []
+        record.encode_code = ''
+        record.check_code = ''
+        num = record.index + 1
+        before = _Before(self.__symbols, self.__definer, record.index, self.__base)
+
+        try:
+            up_line = prepare(record.text)
+            record.up = up_line
+            record.kind = kind(up_line)
+            if record.kind == NOPCODE:
+                record.line = NOpcode(up_line, num)
+            elif record.kind == ORIGIN:
+                record.addr = origin(up_line)
+                record.line = NOpcode(up_line, num)
+            elif record.kind == INCLUDE:
+                raise BadInclude(f"Bad include in line: {num}")
+            elif record.kind == EQU:
+                symbol = up_line.label
+                self.__link(record, symbol, equ_names(up_line))
+                if symbol in before:
+                    record.codes.append('dup')
+                else:
+                    try:
+                        symbol, val = equ(up_line, before, curr)
+                    except ValueError as e:
+                        raise BadOperand(f"Bad operand in line: {num}") from e
+                    self.__define(symbol, val, record)
+                record.line = NOpcode(up_line, num)
+            else:
+                if record.kind == CHECKSUM:
+                    new_l = Checksum(up_line, curr, num)
+                    self.__checksums.add(record)
+                else:
+                    new_l = Opcode(up_line, curr, before, num)
+                    self.__link(record, '', new_l.names())
+                record.size = len(new_l)
+                record.line = new_l
+                if new_l.symbol():
+                    self.__link(record, new_l.symbol(), ())
+                    if new_l.symbol() in before:
+                        record.codes.append('dup')
+                    else:
+                        self.__define(new_l.symbol(), curr, record)
+        except (CustomException, ValueError) as e:
+            code = Diagnostic.from_exception(e, num).code
+            record.codes.append(code)
+            record.line = NOpcode(record.text, num, code)
+            record.size = 0
+
+        new_symbol = record.defines if self.__definer.get(record.defines) is record else ''
+        changed = set()
+        if old_symbol and (old_symbol != new_symbol or old_value != self.__symbols[new_symbol]):
+            changed.add(old_symbol)
+        if new_symbol and new_symbol != old_symbol:
+            changed.add(new_symbol)
+        return changed
+
+    def __link(self, record: _Record, symbol: str, names):
+        """
+        A helper function that records the symbol a line tries to
+        define and the symbols it uses.
+
+        :param record: The Record of the line
+        :param symbol: The symbol, or '' for none
+        :param names: The symbols used
+        """
+        if symbol:
+            record.defines = symbol
+            self.__attempts.setdefault(symbol, set()).add(record)
+        if names:
+            record.uses += tuple(names)
+            for name in names:
+                self.__users.setdefault(name, set()).add(record)
+
+    def __define(self, symbol: str, val: int, record: _Record):
+        """
+        A helper function that stores a symbol. A line further down
+        that defined the same symbol becomes a duplicate, and is
+        scheduled again through the attempts graph.
+
+        :param symbol: The symbol
+        :param val: Its value
+        :param record: The Record of the defining line
+        """
+        self.__symbols[symbol] = val
+        self.__definer[symbol] = record
+
+    def __finish(self, records):
+        """
+        A helper function that encodes the given Opcodes against the
+        final symbol table, then gives every checksum its value. The
+        running XOR is only walked again from the first Record that
+        changed, since the bytes above it are the same.
+
+        :param records: The Records that were assembled again
+        """
+        for record in records:
+            line = record.line
+            if not isinstance(line, Opcode):
+                continue
+            line.replace_symbols(self.__scope())
+            try:
+                line.encode()
+            except CustomException as e:
+                record.encode_code = e.code
+                line.fail(e.code)
+
+        if not self.__checksums:
+            self.__walked = False
+            return
+        first = min((r.index for r in records), default=self.__end()) if self.__walked else 0
+        running = 0
+        if first:
+            prev = self.__records[first - 1]
+            running = prev.running ^ (prev.line.chk() if isinstance(prev.line, Memory) else 0)
+        self.__marks = {label: r for label, r in self.__marks.items() if 0 <= r.index < first}
+        marks = {label: r.running for label, r in self.__marks.items()}
+        self.__walked = True
+
+        for record in self.__records[first:self.__end()]:
+            record.running = running
+            line = record.line
+            if not isinstance(line, Memory):
+                continue
+            if line.symbol() and line.symbol() not in marks:
+                marks[line.symbol()] = running
+                self.__marks[line.symbol()] = record
+            if isinstance(line, Checksum):
+                if line.error():
+                    line = record.line = Checksum(record.up, record.addr, record.index + 1)
+                record.check_code = ''
+                try:
+                    line.compute(running, marks)
+                except CustomException as e:
+                    record.check_code = e.code
+                    line.fail(e.code)
+            running ^= line.chk()
+
+    def __scope(self):
+        """
+        :return: Every symbol an operand can refer to
+        """
+        return self.__symbols if self.__base is None else ChainMap(self.__symbols, self.__base)
+
+    def __end(self):
+        """
+        :return: The number of Records that were assembled
+        """
+        return len(self.__records) if self.__last is None else self.__last + 1
+
+    def lines(self):
+        """
+        :return: The assembled Lines, in order
+        """
+        return [r.line for r in self.__records[:self.__end()]]
+
+    def symbols(self):
+        """
+        :return: The symbol table, in the order the symbols are defined,
+                 without the base symbols
+        """
+        return dict(sorted(self.__symbols.items(), key=lambda item: self.__definer[item[0]].index))
+
+    def diagnostics(self):
+        """
+        :return: Every problem found, in line order
+        """
+        diagnostics = []
+        for record in self.__records[:self.__end()]:
+            num = record.index + 1
+            codes = record.codes + [record.encode_code, record.check_code, record.place_code]
+            if isinstance(record.line, Opcode) and record.line.error() in ('bbr', 'bam'):
+                codes.append(record.line.error())
+            diagnostics.extend(Diagnostic(num, code) for code in codes if code)
+        return diagnostics
+
+    def num_bytes(self):
+        """
+        :return: The number of bytes assembled
+        """
+        return sum(len(line) for line in self.lines())
+
+    def listing(self):
+        """
+        Generates the console listing in the same format as
+        Parser.print, without waiting on errors.
+
+        :return: A generator of strings
+        """
+        yield 'Assembling\n'
+        for line in self.lines():
+            yield str(line)
+        yield from footer(self.num_bytes(), len(self.diagnostics()), self.symbols())
+
+    def image(self):
+        """
+        :return: A new memory Image holding the machine code
+        """
+        image = Image()
+        for line in self.lines():
+            if isinstance(line, Memory):
+                image.write(line.addr(), line.code(), line.num())
+        return image
+
+    def write_to_file(self, filename, fmt: str = TEXT):
+        """
+        Writes the generated assembly to the given filename in the same
+        format as Parser.write_to_file. Nothing is written if there are
+        errors.
+
+        :param filename: Name of the file to write to
+        :param fmt: TEXT, or one of the keys of Writers.FORMATS
+        """
+        if self.diagnostics():
+            return
+        if fmt != TEXT:
+            write(filename, fmt, self.image().segments())
+            return
+        with open(filename, 'w') as out:
+            out.write('\n'.join(line.assembly() for line in self.lines() if isinstance(line, Memory)))
@@ -0,0 +1,177 @@
+import re
+
+from .Op_Param import compile_expr, is_symbol
+
+NOPCODE = 'nop'
+EQU = 'equ'
+CHECKSUM = 'chk'
+OPCODE = 'opc'
+ORIGIN = 'org'
+INCLUDE = 'inc'
+
+START = int('8000', 16)
+"""The address of any code before the first ORG"""
+
+LEXER = re.compile(r"""
+    (?P<label>[^\s;]*)                               # a label starts in the first column
+    (?:\s+(?P<instr>[^\s;]+))?                       # the instruction
+    (?:\s+(?P<operand>(?:'.'?|".?"?|[^\s;'"])+))?    # the operand, where a quoted character may be a space
+""", re.VERBOSE)
+ORG_HINT = re.compile('ORG', re.IGNORECASE)
+"""Finds lines that might be ORG lines, so only those are split"""
+INSTR_COLUMN = 9
+"""The column instructions started in, in the old fixed-column layout"""
+COMMENT_COLUMN = 25
+"""The column comments started in, in the old fixed-column layout"""
+
+
+class Statement:
+    """
+    A line of source code split into its fields. Fields are separated
+    by any amount of whitespace, so there are no fixed columns and no
+    limits on their lengths. Anything after the operand is a comment,
+    as is a line starting with "*" or ";".
+    """
+    __slots__ = ('text', 'label', 'instr', 'operand')
+
+    def __init__(self, text: str, label: str = '', instr: str = '', operand: str = ''):
+        """
+        :param text: The line with its label and instruction in upper case
+        :param label: The label, or '' if there is none
+        :param instr: The instruction in upper case, or '' if there is none
+        :param operand: The operand, or '' if there is none
+        """
+        self.text = text
+        self.label = label
+        self.instr = instr
+        self.operand = operand
+
+    def __str__(self):
+        return self.text
+
+
+def org(line: str):
+    """
+    :param line: A raw line of source code
+    :return: The address given by an ORG line, or None for any other line
+    """
+    if not ORG_HINT.search(line):
+        return None
+    statement = prepare(line)
+    if statement.instr == 'ORG':
+        return origin(statement)
+    return None
+
+
+def origin(statement: Statement):
+    """
+    Parses a Statement containing the ORG instruction. The address is
+    in hexadecimal, with or without a "$". Will raise a ValueError if
+    it isn't.
+
+    :param statement: A Statement returned by prepare
+    :return: The address the following lines start at
+    """
+    return int(statement.operand.removeprefix('$'), 16)
+
+
+def prepare(line):
+    """
+    Splits a raw line of source code into a Statement. The label and
+    instruction are converted to upper case, both in the fields and in
+    the text of the line. A line that is already a Statement, such as
+    one from an included file, is returned as it is.
+
+    :param line: A raw line of source code, or a Statement
+    :return: The Statement
+    """
+    if isinstance(line, Statement):
+        return line
+    line = line.rstrip()
+    if not line or line[0] == '*' or line.lstrip()[0] == ';':
+        return Statement(line + '\n')
+    match = LEXER.match(line)
+    label = match['label'].upper()
+    instr = (match['instr'] or '').upper()
+    end = match.end('instr') if instr else len(label)
+    return Statement(label + line[len(label):end].upper() + line[end:] + '\n', label, instr, match['operand'] or '')
+
+
+def fixed_comment(statement: Statement):
+    """
+    Determines if the operand of a Statement is really a comment in
+    the old fixed-column layout, where the operand field ended before
+    COMMENT_COLUMN.
+
+    :param statement: A Statement returned by prepare
+    :return: True if the instruction is in INSTR_COLUMN and the operand
+             starts at or after COMMENT_COLUMN
+    """
+    match = LEXER.match(statement.text.rstrip())
+    return match.start('instr') == INSTR_COLUMN and match.start('operand') >= COMMENT_COLUMN
+
+
+def comment_operand(statement: Statement):
+    """
+    Determines if the operand of a Statement is really a comment, for
+    the instructions whose operand may be left out. It is if it can't
+    name a symbol, since symbols are always upper case, or if it's in
+    the comment column of the old fixed-column layout.
+
+    :param statement: A Statement returned by prepare
+    :return: True if the operand is a comment
+    """
+    operand = statement.operand
+    if not operand:
+        return False
+    return is_symbol([operand], 0) and operand != operand.upper() or fixed_comment(statement)
+
+
+def kind(statement: Statement):
+    """
+    Determines which kind of Line a Statement becomes. Comments and
+    blank lines don't have a label or an instruction.
+
+    :param statement: A Statement returned by prepare
+    :return: One of NOPCODE, ORIGIN, INCLUDE, EQU, CHECKSUM, or OPCODE
+    """
+    instr = statement.instr
+    if instr == 'END' or not (instr or statement.label):
+        return NOPCODE
+    if instr == 'ORG':
+        return ORIGIN
+    if instr == 'INCLUDE':
+        return INCLUDE
+    if instr == 'EQU':
+        return EQU
+    if instr == 'CHK':
+        return CHECKSUM
+    return OPCODE
+
+
+def equ(statement: Statement, symbols: dict, addr: int):
+    """
+    Parses a Statement containing the EQU instruction. The value
+    may refer to symbols that are already defined and to the current
+    address with "*". Will raise a ValueError if there is no label or
+    the value can't be evaluated.
+
+    :param statement: A Statement returned by prepare
+    :param symbols: The latest symbol table
+    :param addr: The current memory address
+    :return: The symbol and its value
+    """
+    if not statement.label:
+        raise ValueError()
+    return statement.label, compile_expr(statement.operand).evaluate(symbols, addr) & 0xFFFF
+
+
+def equ_names(statement: Statement):
+    """
+    :param statement: A Statement returned by prepare containing the EQU instruction
+    :return: The names of the symbols its value refers to
+    """
+    try:
+        return compile_expr(statement.operand).names
+    except ValueError:
+        return ()
@@ -0,0 +1,147 @@
+from collections.abc import Mapping
+from contextlib import contextmanager, nullcontext
+from time import perf_counter, process_time
+
+
+class Stats:
+    """
+    Instrumentation for an assembly: wall and CPU time per phase,
+    named counters, and the peak traced memory. Phases and counters
+    keep the order they were first seen in. Hooks are called as each
+    phase ends, so a caller can stream the timings elsewhere.
+    """
+    def __init__(self, hooks=(), enabled: bool = True):
+        """
+        :param hooks: Functions called as hook(name, wall, cpu) when a phase ends
+        :param enabled: False to make every method do nothing
+        """
+        self.__enabled = enabled
+        self.__hooks = list(hooks)
+        self.__phases = {}
+        self.__counters = {}
+        self.__peak_memory = None
+
+    def enabled(self):
+        """
+        :return: False if the Stats records nothing
+        """
+        return self.__enabled
+
+    def add_hook(self, hook):
+        """
+        :param hook: A function called as hook(name, wall, cpu) when a phase ends
+        """
+        self.__hooks.append(hook)
+
+    def phase(self, name: str):
+        """
+        Times a block of code. Timing the same phase again adds to it.
+
+        :param name: The name of the phase
+        :return: A context manager
+        """
+        if not self.__enabled:
+            return nullcontext()
+        return self.__phase(name)
+
+    @contextmanager
+    def __phase(self, name: str):
+        wall = perf_counter()
+        cpu = process_time()
+        try:
+            yield
+        finally:
+            wall = perf_counter() - wall
+            cpu = process_time() - cpu
+            totals = self.__phases.setdefault(name, [0.0, 0.0])
+            totals[0] += wall
+            totals[1] += cpu
+            for hook in self.__hooks:
+                hook(name, wall, cpu)
+
+    def count(self, name: str, amount: int = 1):
+        """
+        :param name: The name of the counter
+        :param amount: The amount to add to it
+        """
+        if self.__enabled:
+            self.__counters[name] = self.__counters.get(name, 0) + amount
+
+    def set_peak_memory(self, peak: int):
+        """
+        :param peak: The peak traced memory in bytes, from tracemalloc
+        """
+        self.__peak_memory = peak
+
+    def phases(self):
+        """
+        :return: A dict mapping each phase to its total wall and CPU seconds
+        """
+        return {name: tuple(totals) for name, totals in self.__phases.items()}
+
+    def counters(self):
+        """
+        :return: A dict mapping each counter to its value
+        """
+        return dict(self.__counters)
+
+    def to_dict(self):
+        """
+        :return: The Stats as a JSON ready dict
+        """
+        return {
+            'phases': {name: {'wall': wall, 'cpu': cpu} for name, (wall, cpu) in self.phases().items()},
+            'counters': self.counters(),
+            'peak_memory': self.__peak_memory,
+        }
+
+    def report(self):
+        """
+        Generates a readable report of the phases, counters, and peak
+        memory.
+
+        :return: A generator of strings
+        """
+        yield "\n--Stats\n"
+        yield f"    {'Phase':<22}{'Wall ms':>10}{'CPU ms':>10}\n"
+        for name, (wall, cpu) in self.phases().items():
+            yield f"    {name:<22}{wall * 1000:>10.3f}{cpu * 1000:>10.3f}\n"
+        yield f"    {'Counter':<22}{'Value':>10}\n"
+        for name, value in self.__counters.items():
+            yield f"    {name:<22}{value:>10}\n"
+        if self.__peak_memory is not None:
+            yield f"    {'Peak memory KiB':<22}{self.__peak_memory / 1024:>10.1f}\n"
+
+
+class CountedLookups(Mapping):
+    """
+    A read-only view of a symbol table that counts every lookup into
+    it, including membership tests, as they happen.
+    """
+    def __init__(self, symbols, stats: Stats, name: str):
+        """
+        :param symbols: The symbol table, which may keep changing underneath
+        :param stats: The Stats to count into
+        :param name: The name of the counter
+        """
+        self.__symbols = symbols
+        self.__stats = stats
+        self.__name = name
+
+    def __getitem__(self, name):
+        self.__stats.count(self.__name)
+        return self.__symbols[name]
+
+    def __contains__(self, name):
+        self.__stats.count(self.__name)
+        return name in self.__symbols
+
+    def __iter__(self):
+        return iter(self.__symbols)
+
+    def __len__(self):
+        return len(self.__symbols)
+
+
+DISABLED = Stats(enabled=False)
+"""A Stats that records nothing, the default for a Parser"""
@@ -0,0 +1,323 @@
+import os
+from collections import ChainMap
+from array import array
+from tempfile import SpooledTemporaryFile
+
+from .Opcode import Opcode
+from .Checksum import Checksum
+from .NOpcode import NOpcode
+from .Memory import Memory
+from .Listing import footer
+from .Diagnostic import Diagnostic
+from .Image import Image
+from .Writers import TEXT, write
+from .Include import expand
+from .Source import *
+from .Exceptions import *
+
+
+class Stream:
+    """
+    A two-pass assembler that never holds the whole program in
+    memory. The first pass keeps only the symbol table and a compact
+    fixup list. The second pass re-reads the source and generates
+    each Line, fully encoded, one at a time. Never waits for input:
+    every problem is collected as a Diagnostic, and a line that
+    can't be assembled is left out of the object code.
+    """
+    SPOOL_SIZE = 1 << 20
+
+    def __init__(self, source, base=None):
+        """
+        Reads through the source once to build the symbol table. The source may be a filename, a
+        seekable file object, or any other iterable of lines. Other
+        iterables can only be read once, so they are spooled to a
+        temporary file as they are read.
+        INCLUDE lines are only expanded when the source is a filename,
+        from the shared IncludeStore.
+
+        :param source: The source code
+        :param base: A read-only symbol table under the program's own, such as a SymbolDatabase, or None
+        """
+        self.__source = source
+        self.__offset = None
+        self.__spool = None
+        # The Diagnostics from the first pass, and the error abbreviation
+        # of each line that couldn't be assembled in it
+        self.__diagnostics = []
+        self.__failed = {}
+        self.__last = None
+        self.__pass_diagnostics = []
+        self.__symbols = {}
+        self.__scope = self.__symbols if base is None else ChainMap(self.__symbols, base)
+        self.__num_bytes = 0
+        self.__image = Image()
+        # Line numbers of the Lines with forward references and the
+        # lengths they were given before the references were known
+        self.__fix_nums = array('L')
+        self.__fix_lens = array('B')
+
+        if not isinstance(source, str):
+            if hasattr(source, 'seekable') and source.seekable():
+                self.__offset = source.tell()
+            else:
+                self.__spool = SpooledTemporaryFile(Stream.SPOOL_SIZE, mode='w+')
+
+        self.__first_pass()
+
+    def __read(self):
+        """
+        A helper function that generates the lines of the source
+        for a single pass.
+
+        :return: A generator of raw lines
+        """
+        if isinstance(self.__source, str):
+            with open(self.__source) as in_file:
+                yield from expand(in_file, self.__source)
+        elif self.__offset is not None:
+            self.__source.seek(self.__offset)
+            yield from self.__source
+        elif self.__spool.tell() == 0:
+            for line in self.__source:
+                if not line.endswith('\n'):
+                    line += '\n'
+                self.__spool.write(line)
+                yield line
+        else:
+            self.__spool.seek(0)
+            yield from self.__spool
+
+    def __first_pass(self):
+        """
+        A helper function that calculates the address of every Line
+        and stores the symbol table. Lines are discarded as soon as
+        their length is known. Checks for duplicate symbols.
+        """
+        curr = START
+        for i, line in enumerate(self.__read(), 1):
+            try:
+                curr = self.__measure(line, i, curr)
+                if curr > Image.SIZE:
+                    raise MemoryFull(f"Memory full in line: {i}")
+            except MemoryFull as e:
+                self.__diagnostics.append(Diagnostic.from_exception(e, i))
+                self.__last = i
+                break
+            except (CustomException, ValueError) as e:
+                diagnostic = Diagnostic.from_exception(e, i)
+                self.__diagnostics.append(diagnostic)
+                self.__failed[i] = diagnostic.code
+
+    def __measure(self, line: str, num: int, curr: int):
+        """
+        A helper function that stores the symbol defined by a single
+        line of source code, if any, and finds its length.
+
+        :param line: A line taken from the source code
+        :param num: The current line number
+        :param curr: The current memory address
+        :return: The memory address after the line
+        """
+        up_line = prepare(line)
+        line_kind = kind(up_line)
+        if line_kind == NOPCODE:
+            return curr
+        elif line_kind == ORIGIN:
+            return origin(up_line)
+        elif line_kind == INCLUDE:
+            raise BadInclude(f"Bad include in line: {num}")
+        elif line_kind == EQU:
+            symbol = up_line.label
+            if symbol in self.__scope:
+                self.__diagnostics.append(Diagnostic(num, 'dup'))
+                return curr
+            try:
+                symbol, val = equ(up_line, self.__scope, curr)
+            except ValueError as e:
+                raise BadOperand(f"Bad operand in line: {num}") from e
+            self.__symbols[symbol] = val
+            return curr
+        elif line_kind == CHECKSUM:
+            new_l = Checksum(up_line, curr, num)
+        else:
+            new_l = Opcode(up_line, curr, self.__scope, num)
+            if new_l.missing():
+                self.__fix_nums.append(num)
+                self.__fix_lens.append(len(new_l))
+
+        if new_l.symbol():
+            if new_l.symbol() not in self.__scope:
+                self.__symbols[new_l.symbol()] = curr
+            else:
+                self.__diagnostics.append(Diagnostic(num, 'dup'))
+        return curr + len(new_l)
+
+    def lines(self):
+        """
+        Re-reads the source and generates every Line with its final
+        encoding. Lines with forward references keep the length they
+        were given in the first pass, so every address matches. Once
+        the generator is exhausted, the byte and error totals and the
+        memory Image are available.
+
+        :return: A generator of Lines
+        """
+        self.__num_bytes = 0
+        self.__pass_diagnostics = []
+        self.__image = Image()
+        fixup = 0
+        curr = START
+        running = 0
+        marks = {}
+
+        for i, line in enumerate(self.__read(), 1):
+            if self.__last is not None and i > self.__last:
+                break
+            if i in self.__failed:
+                yield NOpcode(line, i, self.__failed[i])
+                continue
+            up_line = prepare(line)
+            line_kind = kind(up_line)
+            if line_kind in (NOPCODE, ORIGIN, EQU):
+                if line_kind == ORIGIN:
+                    curr = origin(up_line)
+                yield NOpcode(up_line, i)
+                continue
+            elif line_kind == CHECKSUM:
+                new_l = Checksum(up_line, curr, i)
+                size = len(new_l)
+            else:
+                new_l = Opcode(up_line, curr, self.__scope, i)
+                new_l.replace_symbols(self.__scope)
+                try:
+                    new_l.encode()
+                except CustomException as e:
+                    self.__pass_diagnostics.append(Diagnostic.from_exception(e, i))
+                    new_l.fail(e.code)
+                if fixup < len(self.__fix_nums) and self.__fix_nums[fixup] == i:
+                    size = self.__fix_lens[fixup]
+                    fixup += 1
+                else:
+                    size = len(new_l)
+
+            if new_l.symbol():
+                marks.setdefault(new_l.symbol(), running)
+            if isinstance(new_l, Checksum):
+                try:
+                    new_l.compute(running, marks)
+                except CustomException as e:
+                    self.__pass_diagnostics.append(Diagnostic.from_exception(e, i))
+                    new_l.fail(e.code)
+            elif new_l.error() in ('bbr', 'bam'):
+                self.__pass_diagnostics.append(Diagnostic(i, new_l.error()))
+            running ^= new_l.chk()
+            try:
+                self.__image.write(new_l.addr(), new_l.code(), i)
+            except CustomException as e:
+                self.__pass_diagnostics.append(Diagnostic.from_exception(e, i))
+                new_l.fail(e.code)
+
+            self.__num_bytes += len(new_l)
+            curr += size
+            yield new_l
+
+    def records(self):
+        """
+        Generates the object file records, one per Memory, in the same
+        format as Parser.write_to_file.
+
+        :return: A generator of strings
+        """
+        for line in self.lines():
+            if isinstance(line, Memory):
+                yield line.assembly()
+
+    def listing(self):
+        """
+        Generates the console listing in the same format as
+        Parser.print, without waiting on errors.
+
+        :return: A generator of strings
+        """
+        for diagnostic in self.__diagnostics:
+            if diagnostic.code == 'dup':
+                yield diagnostic.message + '\n'
+        yield 'Assembling\n'
+        for line in self.lines():
+            yield str(line)
+        yield from footer(self.__num_bytes, self.num_errors(), self.__symbols)
+
+    def write_to_file(self, filename, listing=None, fmt: str = TEXT):
+        """
+        Writes the object file in a single pass, optionally writing
+        the listing to a text stream at the same time. As with
+        Parser.write_to_file, the object file is only kept if there
+        are no errors. Any format in Writers.FORMATS is written from
+        the memory Image once the pass is done.
+
+        :param filename: Name of the file to write to
+        :param listing: A text stream for the listing, or None
+        :param fmt: TEXT, or one of the keys of Writers.FORMATS
+        :return: True if the object file was written
+        """
+        if listing is not None:
+            for diagnostic in self.__diagnostics:
+                if diagnostic.code == 'dup':
+                    listing.write(diagnostic.message + '\n')
+            listing.write('Assembling\n')
+
+        temp_name = filename + '.tmp'
+        sep = ''
+        try:
+            with open(temp_name, 'w') as out:
+                for line in self.lines():
+                    if listing is not None:
+                        listing.write(str(line))
+                    if isinstance(line, Memory) and fmt == TEXT:
+                        out.write(sep + line.assembly())
+                        sep = '\n'
+            if fmt != TEXT and not self.num_errors():
+                write(temp_name, fmt, self.__image.segments())
+        except BaseException:
+            os.remove(temp_name)
+            raise
+
+        if listing is not None:
+            listing.writelines(footer(self.__num_bytes, self.num_errors(), self.__symbols))
+
+        if self.num_errors():
+            os.remove(temp_name)
+            return False
+        os.replace(temp_name, filename)
+        return True
+
+    def symbols(self):
+        """
+        :return: The symbol table, without the base symbols
+        """
+        return self.__symbols
+
+    def image(self):
+        """
+        :return: The memory Image filled by the last second pass
+        """
+        return self.__image
+
+    def num_bytes(self):
+        """
+        :return: The number of bytes assembled by the last second pass
+        """
+        return self.__num_bytes
+
+    def num_errors(self):
+        """
+        :return: The number of errors found by both passes
+        """
+        return len(self.__diagnostics) + len(self.__pass_diagnostics)
+
+    def diagnostics(self):
+        """
+        :return: Every problem found by both passes, in line order
+        """
+        return sorted(self.__diagnostics + self.__pass_diagnostics, key=lambda d: d.line)
@@ -0,0 +1,129 @@
+import mmap
+import struct
+from collections.abc import Mapping
+
+MAGIC = b'T34S'
+"""The first bytes of every symbol database"""
+VERSION = 1
+"""The version of the format, bumped whenever it changes"""
+HEADER = struct.Struct('<4sHHI')
+"""The magic, version, reserved word, and number of symbols"""
+ENTRY = struct.Struct('<IHH')
+"""The offset and length of a symbol's name, and its value"""
+EXTENSION = '.sym'
+"""The extension of a symbol database"""
+
+
+def compile_symbols(symbols: dict):
+    """
+    Packs a symbol table into a symbol database. The database is the
+    header, then one index entry per symbol in name order, then the
+    names themselves, so a symbol can be found by a binary search of
+    the index without reading anything else.
+
+    :param symbols: The symbol table, mapping ASCII names to 16-bit values
+    :return: The symbol database as bytes
+    """
+    names = sorted(symbols)
+    blob = bytearray()
+    index = bytearray(ENTRY.size * len(names))
+    base = HEADER.size + len(index)
+    for i, name in enumerate(names):
+        encoded = name.encode('ascii')
+        ENTRY.pack_into(index, i * ENTRY.size, base + len(blob), len(encoded), symbols[name] & 0xFFFF)
+        blob += encoded
+    return HEADER.pack(MAGIC, VERSION, 0, len(names)) + bytes(index) + bytes(blob)
+
+
+class SymbolDatabase(Mapping):
+    """
+    A read-only symbol table backed by a symbol database. Nothing is
+    decoded up front: each lookup is a binary search of the index,
+    straight from the buffer, and the names found are remembered. Used
+    as a base layer under a program's own symbols, which may not
+    redefine them.
+    """
+    def __init__(self, data):
+        """
+        Will raise a ValueError if the data isn't a symbol database.
+
+        :param data: The symbol database as bytes, or any other buffer such as an mmap
+        """
+        if len(data) < HEADER.size:
+            raise ValueError('Not a symbol database')
+        magic, version, _, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a symbol database, or from another version')
+        if len(data) < HEADER.size + count * ENTRY.size:
+            raise ValueError('Symbol database is cut off')
+        self.__data = data
+        self.__count = count
+        self.__found = {}
+
+    @staticmethod
+    def open(filename: str):
+        """
+        Maps a symbol database file into memory. Will raise an OSError
+        if it can't be read, or a ValueError if it isn't a database.
+
+        :param filename: The name of the file
+        :return: The SymbolDatabase
+        """
+        with open(filename, 'rb') as in_file:
+            try:
+                data = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # An empty file can't be mapped
+                data = in_file.read()
+        return SymbolDatabase(data)
+
+    def __entry(self, i: int):
+        """
+        :param i: The position of a symbol in name order
+        :return: The symbol's name as bytes, and its value
+        """
+        offset, length, value = ENTRY.unpack_from(self.__data, HEADER.size + i * ENTRY.size)
+        return self.__data[offset:offset + length], value
+
+    def __lookup(self, name):
+        """
+        :param name: The name of a symbol
+        :return: Its value, or None if it isn't in the database
+        """
+        found = self.__found.get(name, self)
+        if found is not self:
+            return found
+        try:
+            key = name.encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        found = None
+        low, high = 0, self.__count
+        while low < high:
+            mid = (low + high) // 2
+            entry, value = self.__entry(mid)
+            if entry < key:
+                low = mid + 1
+            elif entry > key:
+                high = mid
+            else:
+                found = value
+                break
+        self.__found[name] = found
+        return found
+
+    def __getitem__(self, name):
+        value = self.__lookup(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return self.__lookup(name) is not None
+
+    def __iter__(self):
+        for i in range(self.__count):
+            yield self.__entry(i)[0].decode('ascii')
+
+    def __len__(self):
+        return self.__count
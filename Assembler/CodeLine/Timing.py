@@ -0,0 +1,118 @@
+from .Opcode import Opcode, CYCLES, PAGE_PENALTY
+from .Memory import Memory
+from .Disassembler import Instruction
+
+CYCLE_FIELDS = ('line', 'address', 'bytes', 'cycles', 'max_cycles', 'note')
+"""The columns of an exported cycle report"""
+ROUTINE_FIELDS = ('routine', 'address', 'bytes', 'cycles', 'max_cycles', 'page_crossings')
+"""The columns of an exported routine report"""
+START_ROUTINE = '(start)'
+"""The name of the code before the first label"""
+
+
+def timing(line: Memory):
+    """
+    Works out the cycles a single Line takes. Branches take one more
+    cycle when taken, and two if the target is on another page than
+    the next instruction. A lengthened branch is the opposite branch,
+    then a JMP. Indexed reads take one more cycle if the
+    index carries into the next page, which can only happen if the base
+    address doesn't start a page. (zp),Y reads depend on the pointer,
+    so only their worst case counts the extra cycle, without a note.
+
+    :param line: A Line that takes up memory
+    :return: The cycles at best and at worst, and a note on any page
+             crossing, '' if there is none
+    """
+    if not isinstance(line, Opcode) or not line.code():
+        return 0, 0, ''
+    instr, mode = line.instr(), line.mode()
+    if line.long():
+        # Either the opposite branch is taken over the JMP, or it falls through to the JMP
+        skip = 4 if (line.addr() + 2) >> 8 != (line.addr() + 5) >> 8 else 3
+        return skip, 5, ''
+    cycles = CYCLES[(instr, mode)]
+    if mode == 'rel':
+        target = Instruction(line.addr(), line.code(), instr, mode).value()
+        if target >> 8 != (line.addr() + 2) >> 8:
+            return cycles, cycles + 2, f"branch to ${target:04X} crosses a page"
+        return cycles, cycles + 1, ''
+    if (instr, mode) not in PAGE_PENALTY:
+        return cycles, cycles, ''
+    if mode == 'iny':
+        return cycles, cycles + 1, ''
+    base = Instruction(line.addr(), line.code(), instr, mode).value()
+    if base & 0xFF:
+        register = mode[-1].upper()
+        return cycles, cycles + 1, f"${base:04X},{register} crosses a page when {register} > ${0xFF - (base & 0xFF):02X}"
+    return cycles, cycles, ''
+
+
+def cycle_rows(lines):
+    """
+    Converts the Lines that take up memory into rows of the cycle report.
+
+    :param lines: An iterable of Lines
+    :return: A generator of dicts with the keys in CYCLE_FIELDS
+    """
+    for line in lines:
+        if not isinstance(line, Memory) or not line.code():
+            continue
+        cycles, max_cycles, note = timing(line)
+        yield {'line': line.num(), 'address': f"{line.addr():04X}", 'bytes': len(line.code()),
+               'cycles': cycles, 'max_cycles': max_cycles, 'note': note}
+
+
+def routine_rows(lines):
+    """
+    Rolls the cycle report up by routine. Each label on a Line that
+    takes up memory starts a routine, which runs until the next one.
+    The cycles are for running through each instruction once.
+
+    :param lines: An iterable of Lines
+    :return: A generator of dicts with the keys in ROUTINE_FIELDS
+    """
+    row = None
+    for line in lines:
+        if not isinstance(line, Memory) or not line.code():
+            continue
+        if row is None or line.symbol():
+            if row is not None:
+                yield row
+            row = {'routine': line.symbol() or START_ROUTINE, 'address': f"{line.addr():04X}",
+                   'bytes': 0, 'cycles': 0, 'max_cycles': 0, 'page_crossings': 0}
+        cycles, max_cycles, note = timing(line)
+        row['bytes'] += len(line.code())
+        row['cycles'] += cycles
+        row['max_cycles'] += max_cycles
+        row['page_crossings'] += bool(note)
+    if row is not None:
+        yield row
+
+
+def _span(low: int, high: int):
+    """
+    :return: The cycles as "low-high", or just one number if they're the same
+    """
+    return f"{low}" if low == high else f"{low}-{high}"
+
+
+def report(lines):
+    """
+    Generates a readable report of the cycles and bytes of every
+    instruction, with any page crossing, then of every routine.
+
+    :param lines: A list of Lines
+    :return: A generator of strings
+    """
+    yield "\n--Cycles\n"
+    yield f"    {'Line':>5}  {'Addr':<4}  {'Bytes':>5}  {'Cycles':>6}  Note\n"
+    for row in cycle_rows(lines):
+        cycles = _span(row['cycles'], row['max_cycles'])
+        yield f"    {row['line']:>5}  {row['address']:<4}  {row['bytes']:>5}  {cycles:>6}  {row['note']}".rstrip() + '\n'
+    yield "\n--Routines\n"
+    yield f"    {'Routine':<16}{'Addr':<6}{'Bytes':>6}{'Cycles':>10}  Page crossings\n"
+    for row in routine_rows(lines):
+        cycles = _span(row['cycles'], row['max_cycles'])
+        yield (f"    {row['routine']:<16}{row['address']:<6}{row['bytes']:>6}{cycles:>10}  "
+               f"{row['page_crossings'] or ''}").rstrip() + '\n'
@@ -0,0 +1,97 @@
+"""
+Binary object file backends. Each one turns the segments of a program,
+pairs of a start address and a contiguous byte buffer in address
+order, into the complete file contents, so the file can be written in
+a single bulk write. Only the populated ranges are written, except in
+a raw binary, which has no addresses.
+"""
+
+TEXT = 'text'
+
+
+def raw(segments: list):
+    """
+    A raw binary image with no addresses. The loader has to know the
+    start address. Any gaps between segments are filled with zeros.
+
+    :param segments: The (start, data) pairs to write
+    :return: The file contents
+    """
+    if not segments:
+        return b''
+    base = segments[0][0]
+    out = bytearray(segments[-1][0] + len(segments[-1][1]) - base)
+    for start, data in segments:
+        out[start - base:start - base + len(data)] = data
+    return bytes(out)
+
+
+def intel_hex(segments: list, width: int = 16):
+    """
+    Intel HEX: data (00) records of up to width bytes for each segment,
+    followed by an end of file (01) record. Each record ends with the
+    two's complement of the sum of its bytes.
+
+    :param segments: The (start, data) pairs to write
+    :param width: The number of data bytes per record
+    :return: The file contents
+    """
+    records = []
+    for start, data in segments:
+        view = memoryview(data)
+        for offset in range(0, len(view), width):
+            chunk = view[offset:offset + width]
+            addr = (start + offset) & 0xFFFF
+            record = bytes((len(chunk), addr >> 8, addr & 0xFF, 0x00)) + chunk
+            records.append(f":{record.hex().upper()}{-sum(record) & 0xFF:02X}\n")
+    records.append(":00000001FF\n")
+    return ''.join(records).encode('ascii')
+
+
+def s_record(segments: list, width: int = 16):
+    """
+    Motorola S-records: an S0 header, S1 records of up to width bytes
+    for each segment, and an S9 record giving the lowest address as
+    the entry point. Each record ends with the one's complement of the
+    sum of its count, address, and data bytes.
+
+    :param segments: The (start, data) pairs to write
+    :param width: The number of data bytes per record
+    :return: The file contents
+    """
+    def record(kind, addr, chunk=b''):
+        body = bytes((len(chunk) + 3, addr >> 8, addr & 0xFF)) + chunk
+        return f"S{kind}{body.hex().upper()}{~sum(body) & 0xFF:02X}\n"
+
+    records = [record(0, 0)]
+    for start, data in segments:
+        view = memoryview(data)
+        for offset in range(0, len(view), width):
+            records.append(record(1, (start + offset) & 0xFFFF, view[offset:offset + width]))
+    records.append(record(9, segments[0][0] & 0xFFFF if segments else 0))
+    return ''.join(records).encode('ascii')
+
+
+FORMATS = {
+    'bin': (raw, '.bin'),
+    'ihex': (intel_hex, '.hex'),
+    'srec': (s_record, '.s19'),
+}
+"""The binary backends and their file extensions"""
+
+EXTENSIONS = {TEXT: '.o', **{name: ext for name, (_, ext) in FORMATS.items()}}
+"""The file extension of every format, including the text format"""
+
+
+def write(filename: str, fmt: str, segments: list):
+    """
+    Writes the segments to the given filename in a single write.
+    If the file already exists, its contents are overwritten.
+
+    :param filename: Name of the file to write to
+    :param fmt: One of the keys of FORMATS
+    :param segments: The (start, data) pairs to write, in address order
+    """
+    backend, _ = FORMATS[fmt]
+    with open(filename, 'wb') as out:
+        out.write(backend(segments))
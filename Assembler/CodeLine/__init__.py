@@ -0,0 +1,2 @@
+__version__ = "1.1.0"
+"""The assembler version, part of every cache key"""
@@ -0,0 +1,298 @@
+import gc
+import glob
+import json
+import os
+import random
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from time import perf_counter
+
+from CodeLine.Parser import Parser
+from CodeLine.Stream import Stream
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+"""The directory holding the sample_*.s sources and their golden sample_*.o outputs"""
+
+
+SYMBOL_LINES = 8
+"""The number of lines per symbol in a generated program, so larger
+programs have larger symbol tables"""
+
+
+def line(label='', instr='', operand='', comment=''):
+    """
+    Lays out a line of source code in the fixed columns.
+
+    :param label: The label, up to 8 characters
+    :param instr: The instruction
+    :param operand: The operand, up to 11 characters
+    :param comment: An optional comment
+    :return: The line
+    """
+    text = f"{label:<9}{instr:<5}{operand}"
+    if comment:
+        text = f"{text:<26}{comment}"
+    return text.rstrip() + '\n'
+
+
+def generate(num_lines: int = 10000, seed: int = 0, max_symbols: int = None, checksums: int = 4,
+             origin: int = 0x0800):
+    """
+    Generates a synthetic T34 program. The program has a chain of EQUs
+    built from each other, blocks of code under labels with forward and
+    backward branches, forward JSRs and JMPs across the program,
+    operand expressions in every addressing mode, comments, and CHK
+    directives spread evenly through the code. It assembles without
+    errors as long as it fits in memory, which holds up to about
+    25,000 lines.
+
+    :param num_lines: The approximate number of lines
+    :param seed: The random seed, so the same arguments give the same program
+    :param max_symbols: The number of symbols to define, split between EQUs and labels,
+                        or None for one per SYMBOL_LINES lines, and at least 250
+    :param checksums: The number of CHK directives
+    :param origin: The address of the first byte
+    :return: The program as a list of lines
+    """
+    rand = random.Random(seed)
+    if max_symbols is None:
+        max_symbols = max(250, num_lines // SYMBOL_LINES)
+    num_equs = max(2, min(max_symbols // 8, num_lines // 16))
+    num_labels = max(2, min(max_symbols - num_equs, num_lines // 6))
+    block = max(4, num_lines // num_labels)
+
+    lines = [f"* SYNTHETIC PROGRAM, {num_lines} LINES, SEED {seed}\n",
+             line('', 'ORG', f"${origin:04X}"), '*\n']
+    equs = []
+    for i in range(num_equs):
+        name = f"C{i:03d}"
+        if not equs:
+            value = f"${rand.randrange(0x10, 0x80):02X}"
+        else:
+            prev = rand.choice(equs[-4:])
+            value = rand.choice([f"{prev}+{rand.randrange(1, 9)}&$FF", f"{prev}*2&$FF",
+                                 f"{prev}!%101", f"{prev}.$40", f"{prev}-1&$FF"])
+        lines.append(line(name, 'EQU', value))
+        equs.append(name)
+    lines.append('*\n')
+
+    chk_every = max(1, num_labels // (checksums + 1)) if checksums else 0
+    chk_done = 0
+    for i in range(num_labels):
+        label = f"L{i:04d}"
+        if chk_every and i and i % chk_every == 0 and chk_done < checksums:
+            scope = rand.choice(['', f"L{rand.randrange(max(0, i - chk_every), i):04d}"])
+            lines.append(line('', 'CHK', scope, '; CHECKSUM'))
+            chk_done += 1
+        for j in range(block):
+            c = rand.choice(equs)
+            kind = rand.randrange(12)
+            if kind == 0:
+                args = ('CLC',)
+            elif kind == 1:
+                args = ('LDA', f"#{c}+1&$FF")
+            elif kind == 2:
+                args = ('STA', f"{c},X")
+            elif kind == 3:
+                args = ('LDA', f"({c}),Y")
+            elif kind == 4:
+                args = ('ADC', f"${rand.randrange(0x100, 0xFFFF):04X},Y")
+            elif kind == 5:
+                args = ('EOR', f"#{c}&$7F")
+            elif kind == 6:
+                args = ('INX',)
+            elif kind == 7:
+                args = ('CMP', f"#'{chr(rand.randrange(65, 91))}")
+            elif kind == 8 and j >= block - 8 and i + 1 < num_labels:
+                args = ('BNE', f"L{i + 1:04d}")
+            elif kind == 9 and 0 < j < 8:
+                args = ('BEQ', label)
+            elif kind == 10:
+                args = ('JSR', f"L{rand.randrange(num_labels):04d}")
+            else:
+                args = ('STY', f"{c}")
+            lines.append(line(label if j == 0 else '', *args))
+            if rand.randrange(20) == 0:
+                lines.append(f"* BLOCK {i} STEP {j}\n")
+        lines.append(line('', 'JMP', f"L{(i + 2) % num_labels:04d}"))
+    while chk_done < checksums:
+        lines.append(line('', 'CHK'))
+        chk_done += 1
+    lines.append(line('', 'END'))
+    return lines
+
+
+def golden():
+    """
+    Assembles every sample_*.s and checks the object output against its
+    golden sample_*.o, with both the Parser and the Stream. A sample
+    without a golden output must fail to assemble.
+
+    :return: A list of problems, empty if every sample matches
+    """
+    problems = []
+    for source in sorted(glob.glob(os.path.join(SAMPLES, 'sample_*.s'))):
+        name = os.path.basename(source)
+        with open(source) as in_file:
+            in_lines = in_file.readlines()
+        obj_name = source.rsplit('.', 1)[0] + '.o'
+        expected = None
+        if os.path.exists(obj_name):
+            with open(obj_name) as obj_file:
+                expected = obj_file.read()
+
+        parsed = Parser(in_lines, False).object()
+        parsed = parsed.decode('ascii') if parsed is not None else None
+        stream = Stream(in_lines)
+        streamed = '\n'.join(stream.records())
+        if stream.num_errors():
+            streamed = None
+        for kind, actual in (('Parser', parsed), ('Stream', streamed)):
+            if actual != expected:
+                problems.append(f"{name}: {kind} output doesn't match {os.path.basename(obj_name)}")
+    return problems
+
+
+def measure(lines: list, repeat: int = 3):
+    """
+    Times each phase of assembling the program, keeping the best of
+    several runs, then measures the peak memory of a Parser run.
+
+    :param lines: The program
+    :param repeat: The number of timed runs
+    :return: A dict of timings in seconds, the byte count, and the peak memory in bytes
+    """
+    best = {}
+
+    def timed(phase, fn):
+        start = perf_counter()
+        result = fn()
+        best[phase] = min(best.get(phase, float('inf')), perf_counter() - start)
+        return result
+
+    for _ in range(repeat):
+        gc.collect()
+        parser = timed('parse', lambda: Parser(lines, False))
+        timed('listing', lambda: ''.join(parser.listing()))
+        timed('object', lambda: parser.object())
+        timed('stream', lambda: sum(1 for _ in Stream(lines).records()))
+
+    gc.collect()
+    tracemalloc.start()
+    Parser(lines, False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'lines': len(lines),
+        'bytes': parser.num_bytes(),
+        'errors': len(parser.diagnostics()),
+        'times': best,
+        'lines_per_second': len(lines) / best['parse'],
+        'peak_memory': peak,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """
+    Checks the results against a saved baseline.
+
+    :param results: The results of this run, by case name
+    :param baseline: The results of an earlier run, by case name
+    :param tolerance: The fraction by which throughput may drop or memory may grow
+    :return: A list of regressions, empty if there are none
+    """
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if result['lines_per_second'] < old['lines_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['lines_per_second']:.0f} lines/s, "
+                               f"baseline {old['lines_per_second']:.0f}")
+        if result['peak_memory'] > old['peak_memory'] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {result['peak_memory'] / 1024:.0f} KiB, "
+                               f"baseline {old['peak_memory'] / 1024:.0f}")
+    return regressions
+
+
+def parse_args(argv):
+    """
+    Parses the command-line arguments.
+
+    :param argv: The arguments, not including the program name
+    :return: The parsed arguments
+    """
+    arg_parser = ArgumentParser(prog='bench.py', description='Benchmarks the T34 assembler on synthetic programs.')
+    arg_parser.add_argument('--sizes', default='1000,5000,20000',
+                            help='comma separated program sizes in lines (default: %(default)s)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='the generator seed (default: %(default)s)')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+                            help='the number of timed runs, keeping the best (default: %(default)s)')
+    arg_parser.add_argument('--save', metavar='FILE', help='save the results as a baseline')
+    arg_parser.add_argument('--baseline', metavar='FILE', help='fail if the results regress from this baseline')
+    arg_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='the allowed drop in throughput or growth in memory (default: %(default)s)')
+    arg_parser.add_argument('--generate', type=int, metavar='LINES',
+                            help='print a synthetic program of this size instead of benchmarking')
+    arg_parser.add_argument('--symbols', type=int, metavar='N',
+                            help=f'the number of symbols each program defines (default: one per {SYMBOL_LINES} lines)')
+    arg_parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    return arg_parser.parse_args(argv)
+
+
+def main():
+    """
+    Checks the golden outputs, benchmarks every size, and compares the
+    results to a baseline. Exits with 1 on any mismatch or regression.
+    """
+    args = parse_args(sys.argv[1:])
+    if args.generate:
+        sys.stdout.writelines(generate(args.generate, args.seed, args.symbols))
+        return
+
+    problems = golden()
+    results = {}
+    for size in (int(s) for s in args.sizes.split(',')):
+        name = f"synthetic-{size}"
+        results[name] = measure(generate(size, args.seed, args.symbols), args.repeat)
+        if results[name]['errors']:
+            problems.append(f"{name}: assembled with {results[name]['errors']} errors")
+
+    if args.save:
+        with open(args.save, 'w') as out:
+            json.dump(results, out, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as in_file:
+            regressions = compare(results, json.load(in_file), args.tolerance)
+
+    if args.json:
+        report = {'golden': problems, 'results': results}
+        if args.baseline:
+            report['regressions'] = regressions
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"Golden outputs and synthetic programs: {'OK' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"    {problem}")
+        print(f"\n{'Case':<18}{'Lines':>7}{'Bytes':>7}{'Parse':>10}{'Listing':>10}{'Object':>10}"
+              f"{'Stream':>10}{'Lines/s':>10}{'Peak KiB':>10}")
+        for name, r in results.items():
+            t = r['times']
+            print(f"{name:<18}{r['lines']:>7}{r['bytes']:>7}" +
+                  ''.join(f"{t[phase] * 1000:>8.2f}ms" for phase in ('parse', 'listing', 'object', 'stream')) +
+                  f"{r['lines_per_second']:>10.0f}{r['peak_memory'] / 1024:>10.0f}")
+        if args.baseline:
+            print(f"\nRegressions against {args.baseline}: {len(regressions) or 'none'}")
+            for regression in regressions:
+                print(f"    {regression}")
+
+    if problems or regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,790 @@
+import cProfile
+import hashlib
+import io
+import json
+import os
+import pstats
 import sys
+import tracemalloc
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
+from functools import partial
+from glob import glob, has_magic
+from time import perf_counter, sleep, strftime
 
 from CodeLine.Parser import Parser
+from CodeLine.Stream import Stream
+from CodeLine.Session import Session
+from CodeLine.Service import Service
+from CodeLine.Diagnostic import to_json
+from CodeLine.Cache import Cache, Entry
+from CodeLine.Include import STORE
+from CodeLine.SymbolDatabase import SymbolDatabase, EXTENSION as SYMBOLS_EXTENSION, compile_symbols
+from CodeLine.Stats import Stats, DISABLED
+from CodeLine.Listing import LINE_FIELDS, SYMBOL_FIELDS, line_rows, symbol_rows, export_format, export_to_file
+from CodeLine.Module import Module, EXTENSION as MODULE_EXTENSION, assemble_module
+from CodeLine.Linker import Linker
+from CodeLine.Timing import CYCLE_FIELDS, cycle_rows, report
+from CodeLine.Source import START
+from CodeLine.Disassembler import disassemble, disassemble_image, read_object, round_trip
+from CodeLine.Writers import TEXT, FORMATS, EXTENSIONS
 from CodeLine.Exceptions import *
 
 
+LISTING_BUFFER = 1 << 16
+"""The buffer size of a listing file"""
+OUTPUT_OPTIONS = ('relax', 'long_branches')
+"""The options that change the object file or listing, so they are part of the cache key"""
+
+
+def parse_args(argv):
+    """
+    Parses the command-line arguments.
+
+    :param argv: The arguments, not including the program name
+    :return: The parsed arguments
+    """
+    arg_parser = ArgumentParser(prog='main.py', description='Assembles T34 source files.')
+    arg_parser.add_argument('filenames', nargs='*', metavar='filename',
+                            help='the source files or glob patterns to assemble')
+    arg_parser.add_argument(
+        '--stream', action='store_true',
+        help='assemble in two streaming passes without holding the program in memory'
+    )
+    arg_parser.add_argument(
+        '--batch', action='store_true',
+        help='assemble every file across a process pool and print a summary (implied by several files)'
+    )
+    arg_parser.add_argument(
+        '-k', '--keep-going', action='store_true',
+        help="collect every error instead of stopping or waiting at each one"
+    )
+    arg_parser.add_argument(
+        '--json', action='store_true',
+        help='print the diagnostics as JSON instead of the listing (implies --keep-going)'
+    )
+    arg_parser.add_argument(
+        '-f', '--format', choices=[TEXT, *FORMATS], default=TEXT,
+        help='the object file format: the text listing of addresses and bytes (.o), '
+             'a raw binary (.bin), Intel HEX (.hex), or Motorola S-records (.s19)'
+    )
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None,
+                            help='the number of processes in batch mode (default: one per core)')
+    arg_parser.add_argument(
+        '--cache', metavar='DIR',
+        help='serve unchanged files from, and store finished assemblies in, this cache directory'
+    )
+    arg_parser.add_argument('--cache-size', type=int, default=Cache.DEFAULT_SIZE >> 20, metavar='MB',
+                            help='the size the cache is trimmed to (default: %(default)s MB)')
+    arg_parser.add_argument('--clear-cache', action='store_true',
+                            help='invalidate every entry in the cache directory first')
+    arg_parser.add_argument(
+        '--watch', action='store_true',
+        help='stay running and reassemble the files, or the .s files in the directories, whenever they change'
+    )
+    arg_parser.add_argument('--interval', type=float, default=0.5, metavar='SECONDS',
+                            help='how often --watch checks for changes (default: %(default)s)')
+    arg_parser.add_argument(
+        '--serve', metavar='ADDRESS',
+        help='run the assembly service on "unix:PATH" or "[HOST:]PORT" (HTTP on 127.0.0.1 by default)'
+    )
+    arg_parser.add_argument('--max-requests', type=int, default=16, metavar='N',
+                            help='the number of assemblies --serve runs at once (default: %(default)s)')
+    arg_parser.add_argument('--timeout', type=float, default=30, metavar='SECONDS',
+                            help='how long --serve lets a single assembly take (default: %(default)s)')
+    arg_parser.add_argument('--no-listing', action='store_true',
+                            help="don't write the listing, only the object file and any errors")
+    arg_parser.add_argument('--listing', metavar='FILE', help='write the listing to FILE instead of the console')
+    arg_parser.add_argument(
+        '--export-listing', metavar='FILE',
+        help='also write every line with its address, bytes, and error to FILE as .json or .csv'
+    )
+    arg_parser.add_argument('--export-symbols', metavar='FILE',
+                            help='also write the symbol table to FILE as .json or .csv')
+    arg_parser.add_argument(
+        '--relax', action='store_true',
+        help='lay the program out again until every forward reference has its smallest encoding, '
+             'so references to zero page use the zero page modes'
+    )
+    arg_parser.add_argument(
+        '--long-branches', action='store_true',
+        help='turn each branch that can\'t reach its target into the opposite branch over a JMP, instead of an error'
+    )
+    arg_parser.add_argument(
+        '--cycles', action='store_true',
+        help='after the listing, report the cycles and bytes of every instruction and routine, '
+             'and flag page crossings'
+    )
+    arg_parser.add_argument('--export-cycles', metavar='FILE',
+                            help='also write the cycles of every instruction to FILE as .json or .csv')
+    arg_parser.add_argument(
+        '--disassemble', action='store_true',
+        help='disassemble the files instead: .o text object files, or raw binaries loaded at --origin'
+    )
+    arg_parser.add_argument(
+        '--origin', type=lambda text: int(text.removeprefix('$'), 16), metavar='ADDR',
+        help='the hexadecimal load address of a raw binary for --disassemble (default: 0), '
+             'or of the first section for --link (default: 8000)'
+    )
+    arg_parser.add_argument(
+        '--round-trip', action='store_true',
+        help='assemble the files, decode every instruction from the machine code, and report any mismatch'
+    )
+    arg_parser.add_argument(
+        '--stats', action='store_true',
+        help='report the time spent in each phase, line and symbol counts, and the peak memory on stderr'
+    )
+    arg_parser.add_argument(
+        '--profile', metavar='FILE',
+        help='profile the assembly with cProfile, save the profile to FILE, and print the slowest functions on stderr'
+    )
+    arg_parser.add_argument(
+        '--symbols', metavar='FILE',
+        help='look up symbols the program doesn\'t define in this symbol database, built by --compile-symbols'
+    )
+    arg_parser.add_argument(
+        '--compile-symbols', action='store_true',
+        help='compile the symbols defined by each file, such as an EQU header, into a .sym symbol database'
+    )
+    arg_parser.add_argument(
+        '--relocatable', action='store_true',
+        help='assemble each file into a .rel relocatable object that imports the symbols it doesn\'t define'
+    )
+    arg_parser.add_argument(
+        '--link', metavar='FILE',
+        help='link the .rel relocatable objects into FILE, placing their sections in order from --origin'
+    )
+    return arg_parser.parse_args(argv)
+
+
+def expand(patterns):
+    """
+    Expands any glob patterns in the given filenames. Filenames
+    without wildcards are kept even if they don't exist, so they
+    are reported as failures instead of silently skipped.
+
+    :param patterns: Filenames and glob patterns
+    :return: The filenames in order, without duplicates
+    """
+    filenames = []
+    for pattern in patterns:
+        if has_magic(pattern):
+            filenames.extend(sorted(glob(pattern, recursive=True)))
+        else:
+            filenames.append(pattern)
+    return list(dict.fromkeys(filenames))
+
+
+def object_name(filename, fmt=TEXT):
+    """
+    :param filename: The name of a source file
+    :param fmt: The object file format
+    :return: The name of its object file
+    """
+    return filename.rsplit('.', 1)[0] + EXTENSIONS[fmt]
+
+
+def read_source(filename, included=None):
+    """
+    :param filename: The name of a source file
+    :param included: A list every included path is appended to, or None
+    :return: The lines of the file, with every included file spliced in
+    """
+    with open(filename) as in_file:
+        return list(STORE.expand(in_file, filename, included))
+
+
+def cache_key(filename, fmt=TEXT, symbols=None, options=()):
+    """
+    :param filename: The name of a source file
+    :param fmt: The object file format
+    :param symbols: The name of the symbol database, or None
+    :param options: The names of the OUTPUT_OPTIONS that are set
+    :return: The cache key of the file's current contents and those of
+             every file it includes
+    """
+    with open(filename, 'rb') as in_file:
+        source = in_file.read()
+    included = []
+    for _ in STORE.expand(source.decode().splitlines(keepends=True), filename, included):
+        pass
+    includes = [(path, STORE.digest(path)) for path in included]
+    if symbols is not None:
+        with open(symbols, 'rb') as in_file:
+            includes.append((symbols, hashlib.sha256(in_file.read()).digest()))
+    return Cache.key(source, includes, fmt, options)
+
+
+def output_options(args):
+    """
+    :param args: The parsed arguments
+    :return: The names of the OUTPUT_OPTIONS that are set
+    """
+    return tuple(name for name in OUTPUT_OPTIONS if getattr(args, name))
+
+
+def load_symbols(filename):
+    """
+    :param filename: The name of a symbol database, or None
+    :return: The SymbolDatabase, or None
+    """
+    return None if filename is None else SymbolDatabase.open(filename)
+
+
+def compile_header(filename):
+    """
+    Assembles a symbol header and writes the symbols it defines to a
+    symbol database next to it.
+
+    :param filename: The name of the source file
+    :return: True if the database was written
+    """
+    parser = Parser(read_source(filename), False)
+    if parser.diagnostics():
+        for diagnostic in parser.diagnostics():
+            print(f"{filename}:{diagnostic}")
+        return False
+    out_name = os.path.splitext(filename)[0] + SYMBOLS_EXTENSION
+    with open(out_name, 'wb') as out:
+        out.write(compile_symbols(parser.symbols()))
+    print(f"{filename}: {len(parser.symbols())} symbols, wrote {out_name}")
+    return True
+
+
+def fetch(cache, key, out_name):
+    """
+    Looks up a finished assembly and, on a hit, writes its object file.
+
+    :param cache: The Cache
+    :param key: The cache key of the source file
+    :param out_name: The name of the object file
+    :return: The cache Entry, or None on a miss
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        with open(out_name, 'wb') as out:
+            out.write(entry.obj)
+    return entry
+
+
+def store(cache, key, out_name, listing, symbols, num_bytes):
+    """
+    Stores a finished assembly, taking the object file just written.
+
+    :param cache: The Cache
+    :param key: The cache key of the source file
+    :param out_name: The name of the object file
+    :param listing: The console listing
+    :param symbols: The symbol table
+    :param num_bytes: The number of bytes assembled
+    """
+    with open(out_name, 'rb') as obj_file:
+        cache.put(key, Entry(obj_file.read(), listing, symbols, num_bytes))
+
+
+def assemble_file(filename, fmt=TEXT, cache_dir=None, cache_size=Cache.DEFAULT_SIZE, symbols=None):
+    """
+    Assembles a single file for batch mode without printing a listing.
+    Any exception is caught and reported in the result, so one failing
+    file doesn't stop the rest of the batch.
+
+    :param filename: The name of the source file
+    :param fmt: The object file format
+    :param cache_dir: The cache directory, or None to always assemble
+    :param cache_size: The size the cache is trimmed to, in bytes
+    :param symbols: The name of the symbol database, or None
+    :return: A dict with the filename, bytes, errors, time, whether the
+             object file was written or served from the cache, any error
+             message, and the diagnostics as dicts
+    """
+    start = perf_counter()
+    result = {'filename': filename, 'bytes': 0, 'errors': 0, 'written': False, 'cached': False, 'message': ''}
+    out = io.StringIO()
+    out_name = object_name(filename, fmt)
+    try:
+        cache = Cache(cache_dir, cache_size) if cache_dir else None
+        if cache is not None:
+            key = cache_key(filename, fmt, symbols)
+            entry = fetch(cache, key, out_name)
+            if entry is not None:
+                result.update(bytes=entry.num_bytes, written=True, cached=True, diagnostics=[])
+                result['time'] = perf_counter() - start
+                return result
+
+        listing = io.StringIO() if cache is not None else None
+        with redirect_stdout(out):
+            stream = Stream(filename, load_symbols(symbols))
+            result['written'] = stream.write_to_file(out_name, listing, fmt)
+        if cache is not None and result['written']:
+            store(cache, key, out_name, listing.getvalue(), stream.symbols(), stream.num_bytes())
+        result['bytes'] = stream.num_bytes()
+        result['errors'] = stream.num_errors()
+        result['diagnostics'] = [d.to_dict() for d in stream.diagnostics()]
+        if result['diagnostics']:
+            result['message'] = result['diagnostics'][0]['message']
+            if result['errors'] > 1:
+                result['message'] += f", and {result['errors'] - 1} more"
+    except (CustomException, OSError, ValueError) as e:
+        result['errors'] += 1
+        result['message'] = out.getvalue().strip().replace('\n', ' ') or f"{type(e).__name__}: {e}"
+    result['time'] = perf_counter() - start
+    return result
+
+
+def batch(filenames, jobs=None, as_json=False, fmt=TEXT, cache_dir=None, cache_size=Cache.DEFAULT_SIZE,
+          symbols=None):
+    """
+    Assembles every file across a process pool, writing each object
+    file next to its source, then prints one summary line per file.
+
+    :param filenames: The names of the source files
+    :param jobs: The number of processes, or None for one per core
+    :param as_json: True to print the results and diagnostics as JSON instead
+    :param fmt: The object file format
+    :param cache_dir: The cache directory, or None to always assemble
+    :param cache_size: The size the cache is trimmed to, in bytes
+    :param symbols: The name of the symbol database, or None
+    :return: True if every file was assembled without errors
+    """
+    start = perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(partial(assemble_file, fmt=fmt, cache_dir=cache_dir, cache_size=cache_size, symbols=symbols), filenames))
+
+    failed = sum(1 for r in results if not r['written'])
+    if as_json:
+        print(json.dumps(results, indent=2))
+        return failed == 0
+
+    width = max([len(r['filename']) for r in results] + [4])
+    print(f"{'File':<{width}}  {'Bytes':>6}  {'Errors':>6}  {'Time':>9}")
+    for r in results:
+        status = '  cached' if r['cached'] else '' if r['written'] else '  no object file'
+        if r['message']:
+            status += f"  ({r['message']})"
+        print(f"{r['filename']:<{width}}  {r['bytes']:>6}  {r['errors']:>6}  {r['time']:>8.4f}s{status}")
+
+    print(f"\n--End batch, {len(results)} files, {sum(r['bytes'] for r in results)} bytes, "
+          f"failed: {failed}, {perf_counter() - start:.3f}s")
+    return failed == 0
+
+
+def scan(paths):
+    """
+    Finds the source files to watch and takes their signatures.
+    Directories are searched recursively for .s files. Files that
+    don't exist are skipped, so they are picked up once created.
+
+    :param paths: Filenames and directories
+    :return: A dict mapping each filename to its mtime and size
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                filenames.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.s'))
+        else:
+            filenames.append(path)
+
+    found = {}
+    for filename in filenames:
+        signature = stamp(filename)
+        if signature is not None:
+            found[filename] = signature
+    return found
+
+
+def stamp(filename):
+    """
+    :param filename: The name of a file
+    :return: Its mtime and size, or None if it doesn't exist
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def reassemble(filename, sessions, fmt=TEXT, as_json=False, base=None):
+    """
+    Reassembles a changed file for watch mode. The file's Session is
+    kept between changes, and only the lines between the unchanged
+    start and end of the file are edited, so only the lines the change
+    affects are assembled again. A stale object file is removed if the
+    new version has errors.
+
+    :param filename: The name of the source file
+    :param sessions: A dict mapping each filename to its Session and lines
+    :param fmt: The object file format
+    :param as_json: True to print the diagnostics as JSON instead
+    :param base: The SymbolDatabase, or None
+    :return: The names of the files it includes
+    """
+    start = perf_counter()
+    included = []
+    try:
+        new_lines = read_source(filename, included)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"{filename}: {type(e).__name__}: {e}")
+        return []
+
+    if filename in sessions:
+        session, old_lines = sessions[filename]
+        prefix = 0
+        limit = min(len(old_lines), len(new_lines))
+        while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+            suffix += 1
+        session.edit(prefix + 1, new_lines[prefix:len(new_lines) - suffix], len(old_lines) - suffix - prefix)
+    else:
+        session = Session(new_lines, base)
+    sessions[filename] = (session, new_lines)
+
+    out_name = object_name(filename, fmt)
+    diagnostics = session.diagnostics()
+    if diagnostics:
+        if os.path.exists(out_name):
+            os.remove(out_name)
+    else:
+        session.write_to_file(out_name, fmt)
+
+    if as_json:
+        print(to_json(diagnostics, file=filename, written=not diagnostics), flush=True)
+        return included
+    result = f"{len(diagnostics)} errors" if diagnostics else f"wrote {out_name}"
+    print(f"[{strftime('%H:%M:%S')}] {filename}: {session.num_bytes()} bytes, {result}, "
+          f"{(perf_counter() - start) * 1000:.1f} ms")
+    for diagnostic in diagnostics:
+        print(f"{filename}:{diagnostic}")
+    sys.stdout.flush()
+    return included
+
+
+def watch(paths, fmt=TEXT, interval=0.5, as_json=False, base=None):
+    """
+    Polls the source files, and every file each of them includes, for
+    changes to their mtime or size and reassembles each file that
+    changed or whose includes changed, until interrupted. Uses only
+    os.stat, so it works anywhere without file system notifications.
+
+    :param paths: Filenames and directories
+    :param fmt: The object file format
+    :param interval: The number of seconds between polls
+    :param as_json: True to print the diagnostics as JSON instead
+    :param base: The SymbolDatabase, or None
+    """
+    sessions = {}
+    # The files each source includes, and the signatures of each
+    # source and its includes as last assembled
+    includes = {}
+    seen = {}
+    if not as_json:
+        print(f"Watching {', '.join(paths)}, press Ctrl+C to stop", flush=True)
+    try:
+        while True:
+            current = scan(paths)
+            for filename in seen.keys() - current.keys():
+                sessions.pop(filename, None)
+                includes.pop(filename, None)
+                if not as_json:
+                    print(f"[{strftime('%H:%M:%S')}] {filename}: removed", flush=True)
+            signatures = {}
+            for filename, signature in current.items():
+                stamps = {path: stamp(path) for path in includes.get(filename, ())}
+                signatures[filename] = (signature, *stamps.values())
+                if seen.get(filename) != signatures[filename]:
+                    included = reassemble(filename, sessions, fmt, as_json, base)
+                    includes[filename] = list(dict.fromkeys(included))
+                    # Taken before reading where possible, so a change made meanwhile isn't missed
+                    signatures[filename] = (signature, *(stamps[path] if path in stamps else stamp(path)
+                                                         for path in includes[filename]))
+            seen = signatures
+            sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def assemble_relocatable(filename):
+    """
+    Assembles a module into a relocatable object next to it and prints
+    a summary, or the diagnostics.
+
+    :param filename: The name of the source file
+    :return: True if the object was written
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    module, diagnostics = assemble_module(read_source(filename), name)
+    if module is None:
+        for diagnostic in diagnostics:
+            print(f"{filename}:{diagnostic}")
+        return False
+    out_name = os.path.splitext(filename)[0] + MODULE_EXTENSION
+    module.write_to_file(out_name)
+    print(f"{filename}: {len(module.code())} bytes, {len(module.exports())} exports, "
+          f"{len(module.imports())} imports, {len(module.relocations())} relocations, wrote {out_name}")
+    return True
+
+
+def link(filenames, out_name, origin=START, fmt=TEXT):
+    """
+    Links relocatable objects and prints where each section went, or
+    the errors.
+
+    :param filenames: The relocatable objects, in the order they are placed
+    :param out_name: The name of the linked object file
+    :param origin: The address of the first section
+    :param fmt: The object file format
+    :return: True if the linked file was written
+    """
+    linker = Linker([Module.read(filename) for filename in filenames], origin)
+    for error in linker.errors():
+        print(error)
+    if not linker.write_to_file(out_name, fmt):
+        return False
+    for name, base in linker.bases().items():
+        print(f"    {name:<16}${base:04X}")
+    print(f"--End link, {len(linker.image())} bytes, wrote {out_name}")
+    return True
+
+
+def disassemble_file(filename, origin=0):
+    """
+    Prints the instructions in an object file. Text object files are
+    read by address, and anything else is read as a raw binary.
+
+    :param filename: The object file
+    :param origin: The address of the first byte of a raw binary
+    """
+    if filename.endswith(EXTENSIONS[TEXT]):
+        with open(filename) as in_file:
+            instructions = disassemble_image(read_object(in_file.read()))
+    else:
+        with open(filename, 'rb') as in_file:
+            instructions = disassemble(in_file.read(), origin)
+    sys.stdout.writelines(map(str, instructions))
+
+
+def verify(filenames, base=None):
+    """
+    Round-trips every source file through the assembler and the
+    disassembler and prints the mismatches.
+
+    :param filenames: The source files
+    :param base: The SymbolDatabase, or None
+    :return: True if every file matches
+    """
+    failed = 0
+    start = perf_counter()
+    for filename in filenames:
+        problems = round_trip(read_source(filename), base)
+        print(f"{filename}: {'OK' if not problems else 'FAILED'}")
+        for problem in problems:
+            print(f"    {problem}")
+        failed += bool(problems)
+    print(f"{len(filenames) - failed} of {len(filenames)} round-tripped in {perf_counter() - start:.2f} s")
+    return not failed
+
+
+def open_listing(args):
+    """
+    :param args: The parsed arguments
+    :return: A context manager giving the text stream the listing is
+             written to, or None if there is no listing
+    """
+    if args.listing:
+        return open(args.listing, 'w', buffering=LISTING_BUFFER)
+    return nullcontext(None if args.no_listing else sys.stdout)
+
+
+def wants_tables(args):
+    """
+    :param args: The parsed arguments
+    :return: True if the arguments ask for an export or the cycle report
+    """
+    return bool(args.export_listing or args.export_symbols or args.cycles or args.export_cycles)
+
+
+def export_tables(args, lines, symbols, listing_out=None):
+    """
+    Writes the exports and the cycle report the arguments ask for.
+
+    :param args: The parsed arguments
+    :param lines: A list of Lines
+    :param symbols: The symbol table
+    :param listing_out: The text stream the listing went to, or None
+    """
+    if args.cycles:
+        out = sys.stderr if args.json else listing_out or sys.stdout
+        out.writelines(report(lines))
+    if args.export_cycles:
+        export_to_file(args.export_cycles, cycle_rows(lines), CYCLE_FIELDS)
+    if args.export_listing:
+        export_to_file(args.export_listing, line_rows(lines), LINE_FIELDS)
+    if args.export_symbols:
+        export_to_file(args.export_symbols, symbol_rows(symbols), SYMBOL_FIELDS)
+
+
+def assemble(filename, args, cache_size: int, stats: Stats = DISABLED, base=None):
+    """
+    Assembles a single file as the arguments ask, writing the listing
+    or printing the diagnostics.
+
+    :param filename: The source file
+    :param args: The parsed arguments
+    :param cache_size: The size the cache is trimmed to in bytes
+    :param stats: The Stats to record into
+    :param base: The SymbolDatabase, or None
+    """
+    out_name = object_name(filename, args.format)
+    cache = Cache(args.cache, cache_size) if args.cache else None
+    with open_listing(args) as listing_out:
+        if cache is not None and not wants_tables(args):
+            key = cache_key(filename, args.format, args.symbols, output_options(args))
+            entry = fetch(cache, key, out_name)
+            if entry is not None:
+                if args.json:
+                    print(to_json([], file=filename, written=True))
+                elif listing_out is not None:
+                    listing_out.write(entry.listing)
+                return
+        elif cache is not None:
+            key = cache_key(filename, args.format, args.symbols, output_options(args))
+
+        if args.stream:
+            stream = Stream(filename, base)
+            if cache is not None:
+                listing = io.StringIO()
+            else:
+                listing = None if args.json else listing_out
+            with stats.phase('stream'):
+                written = stream.write_to_file(out_name, listing, args.format)
+            if args.json:
+                print(to_json(stream.diagnostics(), file=filename, written=written))
+            elif cache is not None and listing_out is not None:
+                listing_out.write(listing.getvalue())
+            if cache is not None and written:
+                store(cache, key, out_name, listing.getvalue(), stream.symbols(), stream.num_bytes())
+            if wants_tables(args):
+                with stats.phase('export'):
+                    export_tables(args, list(stream.lines()), stream.symbols(), listing_out)
+            return
+
+        with stats.phase('read'):
+            in_lines = read_source(filename)
+        out_lines = Parser(in_lines, not (args.keep_going or args.json), stats, base, args.relax, args.long_branches)
+        if args.json:
+            out_lines.write_to_file(out_name, args.format)
+            print(to_json(out_lines.diagnostics(), file=filename, written=not out_lines.diagnostics()))
+        else:
+            if listing_out is not None:
+                out_lines.print(listing_out)
+            out_lines.write_to_file(out_name, args.format)
+        if cache is not None and not out_lines.diagnostics():
+            store(cache, key, out_name, ''.join(out_lines.listing()), out_lines.symbols(), out_lines.num_bytes())
+        with stats.phase('export'):
+            export_tables(args, out_lines.lines(), out_lines.symbols(), listing_out)
+
+
 def main():
     """
     Reads in the source file contents and calls
     the CodeLine module.
     """
-    try:
-        try:
-            in_file = open(sys.argv[1])
-        except IndexError:
-            print('syntax:\n\tpy main.py "filename"')
+    if len(sys.argv) < 2:
+        print('syntax:\n\tpy main.py "filename"')
+        return
+    args = parse_args(sys.argv[1:])
+    filenames = expand(args.filenames)
+    cache_size = args.cache_size << 20
+
+    if args.clear_cache:
+        if not args.cache:
+            print('--clear-cache needs --cache DIR')
+            sys.exit(1)
+        Cache(args.cache, cache_size).clear()
+        if not args.filenames:
             return
-        in_lines = in_file.readlines()
-        in_file.close()
-        out_lines = Parser(in_lines)
-        out_lines.print()
-        out_name = sys.argv[1].rsplit('.', 1)[0] + '.o'
-        out_lines.write_to_file(out_name)
-
-    except (BadOperand, MemoryFull, BadOpcode) as e:
-        raise e
+
+    if args.serve:
+        service = Service(args.jobs, args.max_requests, args.timeout)
+        service.run(args.serve, lambda address: print(f"Serving on {address}, press Ctrl+C to stop", flush=True))
+        return
+    if args.link:
+        try:
+            linked = link(filenames, args.link, START if args.origin is None else args.origin, args.format)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"{type(e).__name__}: {e}")
+            linked = False
+        if not linked:
+            sys.exit(1)
+        return
+    if args.relocatable:
+        if not all([assemble_relocatable(filename) for filename in filenames]):
+            sys.exit(1)
+        return
+    if args.compile_symbols:
+        if not all([compile_header(filename) for filename in filenames]):
+            sys.exit(1)
+        return
+    try:
+        base = load_symbols(args.symbols)
+    except (OSError, ValueError) as e:
+        print(f"{args.symbols}: {e}")
+        sys.exit(1)
+    if (args.relax or args.long_branches) and (args.stream or args.watch or args.batch or len(filenames) > 1):
+        print('--relax and --long-branches need the whole program in memory, '
+              'so they only work on a single file without --stream or --watch')
+        sys.exit(1)
+    if args.watch:
+        watch(filenames, args.format, args.interval, args.json, base)
+        return
+    if args.disassemble:
+        for filename in filenames:
+            if len(filenames) > 1:
+                print(f"\n{filename}:")
+            disassemble_file(filename, args.origin or 0)
+        return
+    if args.round_trip:
+        if not verify(filenames, base):
+            sys.exit(1)
+        return
+    if args.batch or len(filenames) > 1:
+        if not batch(filenames, args.jobs, args.json, args.format, args.cache, cache_size, args.symbols):
+            sys.exit(1)
+        return
+    if not filenames:
+        print('No source files found')
+        sys.exit(1)
+
+    for export_name in (args.export_listing, args.export_symbols, args.export_cycles):
+        if export_name:
+            try:
+                export_format(export_name)
+            except ValueError as e:
+                print(e)
+                sys.exit(1)
+
+    stats = Stats() if args.stats else DISABLED
+    profiler = cProfile.Profile() if args.profile else None
+    if args.stats:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        assemble(filenames[0], args, cache_size, stats, base)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"\n--Profile saved to {args.profile}", file=sys.stderr)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+        if args.stats:
+            stats.set_peak_memory(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            sys.stderr.writelines(stats.report())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The assembler is run from its own directory, so its modules are imported the same way here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
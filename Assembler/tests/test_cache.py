@@ -0,0 +1,37 @@
+import os
+
+from CodeLine.Cache import Cache, Entry
+
+
+def test_key_covers_format_and_includes():
+    key = Cache.key(b' LDA #1\n')
+    assert key == Cache.key(b' LDA #1\n')
+    assert key != Cache.key(b' LDA #2\n')
+    assert key != Cache.key(b' LDA #1\n', fmt='bin')
+    assert key != Cache.key(b' LDA #1\n', [('head.s', b'digest')])
+
+
+def test_put_and_get(tmp_path):
+    cache = Cache(str(tmp_path))
+    key = Cache.key(b' LDA #1\n')
+    assert cache.get(key) is None
+    cache.put(key, Entry(b'8000: A9 01', 'listing', {'A': 1}, 2))
+    entry = cache.get(key)
+    assert (entry.obj, entry.listing, entry.symbols, entry.num_bytes) == (b'8000: A9 01', 'listing', {'A': 1}, 2)
+
+
+def test_clear_and_evict_leave_other_files(tmp_path):
+    other = tmp_path / 'keep'
+    other.mkdir()
+    (other / 'data').write_bytes(b'x' * 100)
+    cache = Cache(str(tmp_path), 0)
+    key = Cache.key(b' LDA #1\n')
+    cache.put(key, Entry(b'8000: A9 01', '', {}, 2))
+    assert cache.get(key) is None
+    assert os.listdir(other) == ['data']
+
+    cache = Cache(str(tmp_path))
+    cache.put(key, Entry(b'8000: A9 01', '', {}, 2))
+    cache.clear()
+    assert cache.get(key) is None
+    assert sorted(os.listdir(tmp_path)) == ['keep']
@@ -0,0 +1,55 @@
+from CodeLine.Linker import Linker
+from CodeLine.Module import Module, assemble_module
+from CodeLine.Parser import Parser
+
+MAIN = [
+    'MAIN     LDA  ZP\n',
+    '         JSR  PRINT\n',
+    '         BNE  MAIN\n',
+    'LOOP     JMP  LOOP\n',
+    'ZP       EQU  $10\n',
+]
+PRINT = [
+    'PRINT    LDX  #0\n',
+    'NEXT     LDA  TEXT,X\n',
+    '         BEQ  DONE\n',
+    '         INX\n',
+    '         BNE  NEXT\n',
+    'DONE     RTS\n',
+    'TEXT     BRK\n',
+]
+
+
+def module(lines, name):
+    assembled, diagnostics = assemble_module(lines, name)
+    assert not diagnostics
+    # Through the object file format and back
+    return Module.from_dict(assembled.to_dict())
+
+
+def whole(origin, *sources):
+    lines = [f"         ORG  ${origin:04X}\n"] + [line for source in sources for line in source]
+    parser = Parser(lines, False, relax=True)
+    assert not parser.diagnostics()
+    return parser
+
+
+def test_forward_zero_page_reference_leaves_no_gap():
+    main = module(MAIN, 'main')
+    assert main.code().hex().upper() == 'A510' '2000C0' 'D0F9' '4C0780'
+    assert main.exports()['LOOP'] == (7, True)
+
+
+def test_linked_modules_match_a_whole_program():
+    for origin in (0x8000, 0x9123):
+        linker = Linker([module(MAIN, 'main'), module(PRINT, 'print')], origin)
+        assert not linker.errors()
+        parser = whole(origin, MAIN, PRINT)
+        end = origin + parser.num_bytes()
+        assert bytes(linker.image().view(origin, end)) == bytes(parser.image().view(origin, end))
+        assert linker.symbols() == parser.symbols()
+
+
+def test_undefined_import_is_an_error():
+    linker = Linker([module(MAIN, 'main')])
+    assert linker.errors() == ['Undefined symbol PRINT in module main']
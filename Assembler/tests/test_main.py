@@ -0,0 +1,47 @@
+import os
+
+import main
+
+
+def test_watch_reassembles_when_an_include_changes(tmp_path, monkeypatch, capsys):
+    header = tmp_path / 'head.s'
+    header.write_text('VALUE    EQU  $01\n')
+    source = tmp_path / 'prog.s'
+    source.write_text('         INCLUDE head.s\n         LDA  #VALUE\n')
+    polls = []
+
+    def sleep(_):
+        polls.append(None)
+        if len(polls) == 1:
+            header.write_text('VALUE    EQU  $22\n')
+            stat = os.stat(header)
+            os.utime(header, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        elif len(polls) == 3:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, 'sleep', sleep)
+    main.watch([str(source)])
+    out = capsys.readouterr().out
+    assert out.count('wrote') == 2
+    assert (tmp_path / 'prog.o').read_text().startswith('8000: A9 22')
+
+
+def test_cache_key_covers_output_options(tmp_path):
+    source = tmp_path / 'prog.s'
+    source.write_text('         LDA  ZP\nZP       EQU  $10\n')
+    keys = {main.cache_key(str(source), options=options) for options in ((), ('relax',), ('long_branches',))}
+    assert len(keys) == 3
+
+
+def test_cached_build_without_relax_isnt_the_relaxed_one(tmp_path, monkeypatch):
+    source = tmp_path / 'prog.s'
+    source.write_text('         LDA  ZP\n         RTS\nZP       EQU  $10\n')
+    objects = []
+    for flags in (['--relax'], [], ['--relax']):
+        monkeypatch.setattr('sys.argv', ['main.py', '--no-listing', '--cache', str(tmp_path / 'cache'), *flags,
+                                         str(source)])
+        main.main()
+        objects.append((tmp_path / 'prog.o').read_text())
+    assert objects[0] == objects[2] != objects[1]
+    assert objects[0].splitlines()[1].startswith('8002: 60')
+    assert objects[1].splitlines()[1].startswith('8003: 60')
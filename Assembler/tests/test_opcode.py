@@ -0,0 +1,39 @@
+from CodeLine.Parser import Parser
+
+
+def assemble(*lines):
+    parser = Parser([line + '\n' for line in lines], False)
+    return parser, bytes(parser.image().view(0x8000, 0x8000 + parser.num_bytes()))
+
+
+def test_comment_after_accumulator_instruction():
+    parser, code = assemble('         ASL  shift left',
+                            '         LSR               HALVE IT',
+                            '         ROL  a',
+                            '         ROR  $10,X  rotate')
+    assert not parser.diagnostics()
+    assert code == bytes.fromhex('0A 4A 2A 76 10')
+
+
+def test_accumulator_instruction_still_takes_symbols():
+    parser, code = assemble('         ASL  COUNT',
+                            '         LSR  COUNT  halve it',
+                            'COUNT    EQU  $1234')
+    assert not parser.diagnostics()
+    assert code == bytes.fromhex('0E 34 12 4E 34 12')
+
+
+def test_comment_after_implied_instruction():
+    parser, code = assemble('         CLC  clear carry', '         INX')
+    assert not parser.diagnostics()
+    assert code == bytes.fromhex('18 E8')
+
+
+def test_comment_after_checksum():
+    parser, code = assemble('         LDA  #$0F',
+                            'START    LDX  #$01',
+                            '         CHK               SUM OF ALL',
+                            '         CHK  START        from start',
+                            '         CHK  checksum here')
+    assert not parser.diagnostics()
+    assert code == bytes.fromhex('A9 0F A2 01 05 A6 A6')
@@ -0,0 +1,59 @@
+from CodeLine.Parser import Parser
+from CodeLine.Timing import timing
+
+FORWARD = [
+    'START    LDA  ZP\n',
+    '         STA  ZP,X\n',
+    '         JMP  START\n',
+    'ZP       EQU  $10\n',
+]
+
+
+def far_branch(distance):
+    """
+    :return: A BEQ over distance bytes of NOPs, then its target
+    """
+    return ['         BEQ  FAR\n'] + ['         NOP\n'] * distance + ['FAR      RTS\n']
+
+
+def assemble(lines, **options):
+    parser = Parser(lines, False, **options)
+    return parser, bytes(parser.image().view(0x8000, 0x8000 + parser.num_bytes()))
+
+
+def test_forward_references_leave_gaps_without_relaxing():
+    parser, _ = assemble(FORWARD)
+    assert not parser.diagnostics()
+    assert parser.image().ranges() != [(0x8000, 0x8000 + parser.num_bytes())]
+
+
+def test_relaxing_gives_forward_references_their_smallest_mode():
+    parser, code = assemble(FORWARD, relax=True)
+    assert not parser.diagnostics()
+    assert parser.image().ranges() == [(0x8000, 0x8007)]
+    assert code == bytes.fromhex('A5 10 95 10 4C 00 80')
+
+
+def test_forward_branch_out_of_range_is_an_error():
+    for distance in (128, 200, 300):
+        parser, _ = assemble(far_branch(distance))
+        assert [(d.line, d.code) for d in parser.diagnostics()] == [(1, 'bbr')]
+    parser, code = assemble(far_branch(127))
+    assert not parser.diagnostics()
+    assert code[:2] == bytes.fromhex('F0 7F')
+
+
+def test_long_branches():
+    parser, code = assemble(far_branch(200), long_branches=True)
+    assert not parser.diagnostics()
+    # BNE over a JMP to FAR, at $8005 + 200
+    assert code[:5] == bytes.fromhex('D0 03 4C CD 80')
+    assert code[-1] == 0x60
+    branch = parser.lines()[0]
+    assert branch.long() and timing(branch) == (3, 5, '')
+
+
+def test_short_branches_stay_short():
+    parser, code = assemble(far_branch(10), relax=True, long_branches=True)
+    assert not parser.diagnostics()
+    assert code[:2] == bytes.fromhex('F0 0A')
@@ -0,0 +1,25 @@
+from CodeLine.Parser import Parser
+from CodeLine.Stream import Stream
+from CodeLine.Session import Session
+
+VECTORS = [
+    '         ORG  $0800\n',
+    'RESET    LDA  #1\n',
+    'IRQ      RTI\n',
+    '         ORG  $FFFA\n',
+    '         JMP  RESET\n',
+    '         JMP  IRQ\n',
+    '         END\n',
+]
+
+
+def test_vector_table_ends_at_top_of_memory():
+    for assembler in (Parser(VECTORS, False), Stream(VECTORS), Session(VECTORS)):
+        list(assembler.lines())
+        assert not assembler.diagnostics()
+        assert bytes(assembler.image().view(0xFFFA, 0x10000)) == bytes.fromhex('4C 00 08 4C 02 08')
+
+
+def test_running_past_top_of_memory_is_full():
+    parser = Parser(VECTORS[:-1] + ['         NOP\n'], False)
+    assert {(d.line, d.code) for d in parser.diagnostics()} == {(7, 'mem')}
@@ -0,0 +1,55 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import CodeLine.Service
+from CodeLine.Service import Service
+
+SLOW = '* BLOCKS UNTIL RELEASED\n'
+
+
+async def request(path, body: dict):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(json.dumps(body).encode() + b'\n')
+    response = json.loads(await reader.readline())
+    writer.close()
+    return response
+
+
+async def exercise(path, release):
+    service = Service(1, 1, 0.1)
+    ready = asyncio.Event()
+    server = asyncio.create_task(service.serve(f"unix:{path}", lambda _: ready.set()))
+    await ready.wait()
+    try:
+        timed_out = await request(path, {'source': SLOW})
+        held = service.health()['active']
+        # The slot is still taken, so this waits for the blocked worker
+        quick = asyncio.create_task(request(path, {'source': ' LDA #1\n'}))
+        await asyncio.sleep(0.3)
+        waiting = not quick.done()
+        release.set()
+        quick = await quick
+        return timed_out, held, waiting, quick, service.health()['active']
+    finally:
+        server.cancel()
+
+
+def test_timeout_keeps_slot_until_worker_finishes(tmp_path, monkeypatch):
+    release = threading.Event()
+    assemble_source = CodeLine.Service.assemble_source
+
+    def blocking(source, fmt):
+        if source == SLOW:
+            release.wait()
+        return assemble_source(source, fmt)
+
+    # Workers are threads here, so the blocked assembly is under the test's control
+    monkeypatch.setattr(CodeLine.Service, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(CodeLine.Service, 'assemble_source', blocking)
+    timed_out, held, waiting, quick, active = asyncio.run(exercise(str(tmp_path / 'asm.sock'), release))
+    assert not timed_out['ok'] and 'longer than' in timed_out['error']
+    assert held == 1 and waiting
+    assert quick['ok'] and quick['object'].startswith('8000: A9 01')
+    assert active == 0
@@ -0,0 +1,39 @@
+from CodeLine.Parser import Parser
+from CodeLine.Session import Session
+
+SOURCE = [
+    '         LDA  #$0F\n',
+    'START    LDX  #$01\n',
+    '         CHK  START\n',
+    '         LDY  #$02\n',
+    '         CHK\n',
+]
+
+
+def same_as_parser(session, lines):
+    parser = Parser(lines, False)
+    assert ''.join(session.listing()) == ''.join(parser.listing())
+    assert [(d.line, d.code) for d in session.diagnostics()] == [(d.line, d.code) for d in parser.diagnostics()]
+
+
+def test_edits_match_a_full_assembly():
+    lines = list(SOURCE)
+    session = Session(lines)
+    same_as_parser(session, lines)
+    lines[3] = '         LDY  #$44\n'
+    session.edit(4, [lines[3]])
+    same_as_parser(session, lines)
+
+
+def test_removing_a_checksum_scope_label():
+    lines = list(SOURCE)
+    session = Session(lines)
+    lines[1] = '         LDX  #$01\n'
+    session.edit(2, [lines[1]])
+    same_as_parser(session, lines)
+    assert [(d.line, d.code) for d in session.diagnostics()] == [(3, 'bop')]
+
+    lines[1] = SOURCE[1]
+    session.edit(2, [lines[1]])
+    same_as_parser(session, lines)
+    assert not session.diagnostics()
@@ -0,0 +1,37 @@
+import os
+
+from CodeLine.Parser import Parser
+from CodeLine.Stats import Stats
+
+SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+
+def test_counts_lookups_and_evaluations_as_they_happen():
+    stats = Stats()
+    Parser(['A        EQU  $10\n', ' LDA A\n', ' LDA B\n', 'B        EQU  2\n'], False, stats)
+    counters = stats.counters()
+    # A and B are each checked before they're defined, A is checked and read
+    # by the first LDA, B is checked by the second, then checked and read again
+    # when its forward reference is replaced
+    assert counters['symbol lookups'] == 7
+    # Both EQUs, the first LDA, and the second once B is known
+    assert counters['expression evaluations'] == 4
+    assert counters['forward references'] == 1
+
+
+def test_disabled_stats_count_nothing():
+    stats = Stats(enabled=False)
+    Parser([' LDA #1\n'], False, stats)
+    assert stats.counters() == {}
+
+
+def test_relaxing_counts_each_line_once():
+    with open(os.path.join(SAMPLES, 'sample_10.s')) as in_file:
+        lines = in_file.readlines()
+    counters = {}
+    for relax in (False, True):
+        stats = Stats()
+        Parser(lines, False, stats, relax=relax, long_branches=relax)
+        counters[relax] = {name: value for name, value in stats.counters().items() if name.startswith('lines: ')}
+    assert counters[False]['lines: opc'] == 48
+    assert counters[True] == counters[False]